@@ -96,6 +96,60 @@ def create_high_accuracy_model(num_classes=len(CLASS_NAMES)):
     model = tf.keras.Model(inputs, outputs, name='noma_cancer_ai_model')
     return model, base_model
 
+# CAM EXPORT - feature map + head Jacobian as extra TFLite outputs
+class HeadJacobian(tf.keras.layers.Layer):
+    """d(logits)/d(pooled features) of the Dense-BN-Dense-Dense head, per input.
+
+    GlobalAveragePooling is linear, so row c is the Grad-CAM channel weighting for
+    class c (up to the 1/(H*W) pooling factor). Inference-mode BatchNorm is a fixed
+    per-unit scale and the ReLU gates are read off the dense activations, so the
+    Jacobian is three matmuls - no gradient ops needed in the TFLite graph.
+    """
+    def __init__(self, dense1, batch_norm, dense2, dense3, **kwargs):
+        super().__init__(**kwargs)
+        self.dense1 = dense1
+        self.batch_norm = batch_norm
+        self.dense2 = dense2
+        self.dense3 = dense3
+
+    def call(self, inputs):
+        hidden1, hidden2 = inputs
+        bn = self.batch_norm
+        bn_scale = bn.gamma * tf.math.rsqrt(bn.moving_variance + bn.epsilon)
+        gate1 = tf.cast(hidden1 > 0, hidden1.dtype) * bn_scale      # (batch, 512)
+        gate2 = tf.cast(hidden2 > 0, hidden2.dtype)                 # (batch, 256)
+        jacobian = tf.transpose(self.dense3.kernel)[None] * gate2[:, None, :]
+        jacobian = tf.matmul(jacobian, tf.transpose(self.dense2.kernel)) * gate1[:, None, :]
+        return tf.matmul(jacobian, tf.transpose(self.dense1.kernel))  # (batch, classes, channels)
+
+def build_cam_export_model(model):
+    """Same network, returning (probabilities, last conv feature map, head Jacobian).
+
+    The kiosk computes a real class-activation map from the one invoke():
+    relu(sum_k jacobian[class, k] * feature_map[..., k]).
+    The Rescaling layer is left out: like any float32 model on the kiosk, the
+    export takes pixels already scaled to [-1, 1].
+    """
+    base = next(layer for layer in model.layers if isinstance(layer, tf.keras.Model))
+    dense1, dense2, dense3 = [layer for layer in model.layers if isinstance(layer, tf.keras.layers.Dense)]
+    batch_norm = next(layer for layer in model.layers if isinstance(layer, tf.keras.layers.BatchNormalization))
+
+    # Re-run the trained layers so the intermediate tensors are reachable
+    inputs = tf.keras.Input(shape=model.input_shape[1:])
+    x = inputs
+    for layer in model.layers[1:]:
+        if isinstance(layer, tf.keras.layers.Rescaling):
+            continue
+        x = layer(x, training=False)
+        if layer is base:
+            feature_map = x
+        elif layer is dense1:
+            hidden1 = x
+        elif layer is dense2:
+            hidden2 = x
+    cam_weights = HeadJacobian(dense1, batch_norm, dense2, dense3, name='cam_weights')([hidden1, hidden2])
+    return tf.keras.Model(inputs, [x, feature_map, cam_weights], name='noma_cancer_ai_cam_model')
+
 # CREATE MODEL
 print("🤖 Creating High-Accuracy Model...")
 model, base_model = create_high_accuracy_model()
@@ -240,6 +294,39 @@ try:
 except Exception as e:
     print(f"❌ TFLite issue: {e}")
 
+# EXPORT CAM-ENABLED TFLITE
+print("\n🔥 Exporting CAM-enabled TFLite model...")
+try:
+    cam_model = build_cam_export_model(model)
+
+    # The Jacobian must match autodiff through the head
+    sample = next(iter(val_ds))[0][:2]
+    probs, feature_map, cam_weights = cam_model(sample / 127.5 - 1.0, training=False)
+    print(f"   • Max probability error vs model: {float(tf.reduce_max(tf.abs(probs - model(sample, training=False)))):.2e}")
+    pooled = tf.reduce_mean(feature_map, axis=[1, 2])
+    gap_index = next(i for i, layer in enumerate(model.layers)
+                     if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D))
+    classifier = model.layers[-1]
+    with tf.GradientTape() as tape:
+        tape.watch(pooled)
+        x = pooled
+        for layer in model.layers[gap_index + 1:-1]:
+            x = layer(x, training=False)
+        logits = tf.matmul(x, classifier.kernel) + classifier.bias
+    autodiff = tape.batch_jacobian(logits, pooled)
+    print(f"   • Max Jacobian error vs autodiff: {float(tf.reduce_max(tf.abs(autodiff - cam_weights))):.2e}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(cam_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    cam_tflite_model = converter.convert()
+    with open('/kaggle/working/noma_model_cam.tflite', 'wb') as f:
+        f.write(cam_tflite_model)
+    print("✅ CAM model saved as: /kaggle/working/noma_model_cam.tflite")
+    print("   Outputs: probabilities (1, classes), feature map (1, H, W, C), CAM weights (1, classes, C)")
+
+except Exception as e:
+    print(f"❌ CAM export issue: {e}")
+
 # PERFORMANCE CHECK
 if final_val_accuracy >= 0.75:
     print("🎉 EXCELLENT! High accuracy achieved with TFLite compatibility!")
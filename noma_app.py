@@ -26,6 +26,10 @@ import numpy as np
 import sqlite3
 import hashlib
 import shutil
+import zlib
+import threading
+import queue
+import uuid
 from datetime import datetime, timedelta
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWidgets import (QLabel, QVBoxLayout, QPushButton, QApplication,
@@ -33,8 +37,8 @@ from PyQt5.QtWidgets import (QLabel, QVBoxLayout, QPushButton, QApplication,
                              QWidget, QHBoxLayout, QTextEdit, QRadioButton,
                              QSpinBox, QComboBox, QCheckBox, QGroupBox, QTabWidget,
                              QListWidget, QListWidgetItem, QDialog, QLineEdit, QSlider, QDialogButtonBox,
-                             QInputDialog, QGridLayout, QFrame)
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QTimer, QPointF
+                             QInputDialog, QGridLayout, QFrame, QListView)
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QTimer, QPointF, QAbstractListModel, QModelIndex
 from PyQt5.QtGui import QPainter, QPen, QColor, QBrush, QPixmap
 from PIL import Image
 import tflite_runtime.interpreter as tflite
@@ -45,6 +49,8 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_agg import FigureCanvasAgg
 import io
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------------- Camera Permission Fix ---------------- #
 os.environ['LIBCAMERA_LOG_LEVELS'] = '0'
@@ -123,17 +129,543 @@ EDUCATIONAL_TIPS = [
 HOME_DIR = os.path.expanduser("~")
 # Use the shared folder for cross-device syncing
 SYNC_FOLDER = "/opt/oracle_share"
-os.makedirs(SYNC_FOLDER, exist_ok=True)
+try:
+    os.makedirs(SYNC_FOLDER, exist_ok=True)
+except OSError as e:
+    # Records wait in the sync outbox until the share is reachable
+    print(f"Sync folder unavailable: {e}")
 
 DB_PATH = os.path.join(HOME_DIR, "noma_longitudinal.db")
+# Scans past the retention horizon live here; it is attached to every connection as "archive"
+ARCHIVE_DB_PATH = os.path.join(HOME_DIR, "noma_longitudinal_archive.db")
 TRACKED_IMAGES_DIR = os.path.join(HOME_DIR, "noma_ai", "tracked_lesions")
 os.makedirs(TRACKED_IMAGES_DIR, exist_ok=True)
 
+# ---------------- DATABASE CONNECTION MANAGER ---------------- #
+# Tuned for the Pi 4 on an SD card: WAL appends commits instead of rewriting a
+# rollback journal, and synchronous=NORMAL only fsyncs at checkpoints.
+DB_CACHE_SIZE_KB = 8192
+DB_MMAP_SIZE = 64 * 1024 * 1024
+DB_BUSY_TIMEOUT_MS = 5000
+DB_STATEMENT_CACHE = 64
+
+SCAN_COLUMNS = ('scan_id, lesion_id, timestamp, ts_epoch, image_path, prediction, confidence, '
+                'abcde_scores, risk_level, match_count, ita_score, skin_tone')
+
+class TrackingDatabase:
+    """Shared SQLite connections for the longitudinal tracking database.
+
+    A single writer connection is shared behind a lock; every thread that reads
+    gets its own read-only connection, so dialogs never open and close files.
+    When archive_path is set the archive database is attached to every connection,
+    and readers get a TEMP view all_scans spanning hot and archived scans.
+    """
+    
+    def __init__(self, path, archive_path=None):
+        self.path = path
+        self.archive_path = archive_path
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+    
+    def _configure(self, conn):
+        conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    
+    def _attach_archive(self, conn, read_only=False):
+        if self.archive_path is None:
+            return
+        if read_only:
+            conn.execute('ATTACH DATABASE ? AS archive', (f"file:{self.archive_path}?mode=ro",))
+            # Only TEMP views may reference an attached database
+            conn.execute(f'''
+                CREATE TEMP VIEW IF NOT EXISTS all_scans AS
+                SELECT {SCAN_COLUMNS} FROM main.scans
+                UNION ALL
+                SELECT {SCAN_COLUMNS} FROM archive.scans AS a
+                -- a scan copied to the archive but not yet deleted is listed once
+                WHERE NOT EXISTS (SELECT 1 FROM main.scans AS m WHERE m.scan_id = a.scan_id)
+            ''')
+            return
+        conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+        conn.execute('PRAGMA archive.journal_mode = WAL')
+        # FULL: an archive copy must be on disk before the originals are deleted
+        conn.execute('PRAGMA archive.synchronous = FULL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS archive.scans (
+                scan_id INTEGER PRIMARY KEY,
+                lesion_id TEXT,
+                timestamp TEXT,
+                ts_epoch INTEGER,
+                image_path TEXT,
+                prediction TEXT,
+                confidence REAL,
+                abcde_scores TEXT,
+                risk_level TEXT,
+                match_count INTEGER,
+                ita_score REAL,
+                skin_tone TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS archive.idx_archive_scans_lesion_time
+            ON scans (lesion_id, ts_epoch, timestamp, prediction, confidence, risk_level, match_count)
+        ''')
+    
+    def writer(self):
+        """Return the shared writer connection, opening it on first use"""
+        with self._write_lock:
+            if self._writer is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False,
+                                       cached_statements=DB_STATEMENT_CACHE)
+                conn.execute('PRAGMA journal_mode = WAL')
+                conn.execute('PRAGMA synchronous = NORMAL')
+                self._configure(conn)
+                self._attach_archive(conn)
+                self._writer = conn
+            return self._writer
+    
+    @contextmanager
+    def transaction(self):
+        """Run a block of writes on the writer connection as one transaction"""
+        with self._write_lock:
+            conn = self.writer()
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+    
+    def reader(self):
+        """Return this thread's read-only connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Make sure the file and WAL exist before opening read-only
+            self.writer()
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False,
+                                   cached_statements=DB_STATEMENT_CACHE)
+            self._configure(conn)
+            self._attach_archive(conn, read_only=True)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+    
+    def query(self, sql, params=()):
+        """Run a read-only query and return all rows"""
+        return self.reader().execute(sql, params).fetchall()
+    
+    def query_one(self, sql, params=()):
+        """Run a read-only query and return the first row (or None)"""
+        return self.reader().execute(sql, params).fetchone()
+    
+    def data_version(self):
+        """PRAGMA data_version of this thread's reader; changes whenever another connection commits"""
+        return self.reader().execute('PRAGMA data_version').fetchone()[0]
+    
+    def close(self):
+        """Close every connection; the WAL is checkpointed when the writer closes"""
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except Exception as e:
+                    print(f"Error closing reader connection: {e}")
+            self._readers = []
+        self._local = threading.local()
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.execute('PRAGMA optimize')
+                    self._writer.close()
+                except Exception as e:
+                    print(f"Error closing writer connection: {e}")
+                self._writer = None
+
+tracking_db = TrackingDatabase(DB_PATH, ARCHIVE_DB_PATH)
+
+def benchmark_db_access(iterations=200):
+    """Compare open/insert/query latency of per-call connections against TrackingDatabase"""
+    import tempfile
+    
+    schema = '''CREATE TABLE IF NOT EXISTS scans (
+        scan_id INTEGER PRIMARY KEY AUTOINCREMENT, lesion_id TEXT, timestamp TEXT,
+        prediction TEXT, confidence REAL, risk_level TEXT)'''
+    insert_sql = 'INSERT INTO scans (lesion_id, timestamp, prediction, confidence, risk_level) VALUES (?, ?, ?, ?, ?)'
+    query_sql = 'SELECT timestamp, prediction, confidence, risk_level FROM scans WHERE lesion_id = ? ORDER BY timestamp DESC LIMIT 20'
+    results = {}
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute(schema)
+        conn.commit()
+        conn.close()
+        
+        open_times, insert_times, query_times = [], [], []
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            conn = sqlite3.connect(legacy_path)
+            t1 = time.perf_counter()
+            conn.execute(insert_sql, (f"lesion_{i % 10}", datetime.now().isoformat(), "Moles", 0.9, "LOW"))
+            conn.commit()
+            t2 = time.perf_counter()
+            conn.execute(query_sql, (f"lesion_{i % 10}",)).fetchall()
+            t3 = time.perf_counter()
+            conn.close()
+            open_times.append(t1 - t0)
+            insert_times.append(t2 - t1)
+            query_times.append(t3 - t2)
+        results['per_call_connect'] = (open_times, insert_times, query_times)
+        
+        db = TrackingDatabase(os.path.join(tmp_dir, "managed.db"))
+        with db.transaction() as cursor:
+            cursor.execute(schema)
+        
+        open_times, insert_times, query_times = [], [], []
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            db.reader()
+            t1 = time.perf_counter()
+            with db.transaction() as cursor:
+                cursor.execute(insert_sql, (f"lesion_{i % 10}", datetime.now().isoformat(), "Moles", 0.9, "LOW"))
+            t2 = time.perf_counter()
+            db.query(query_sql, (f"lesion_{i % 10}",))
+            t3 = time.perf_counter()
+            open_times.append(t1 - t0)
+            insert_times.append(t2 - t1)
+            query_times.append(t3 - t2)
+        db.close()
+        results['tracking_database'] = (open_times, insert_times, query_times)
+    
+    print(f"SQLite access benchmark ({iterations} iterations, mean / p95 in ms)")
+    for name, timings in results.items():
+        line = f"  {name:18s}"
+        for label, values in zip(("open", "insert", "query"), timings):
+            ordered = sorted(values)
+            mean_ms = 1000 * sum(ordered) / len(ordered)
+            p95_ms = 1000 * ordered[int(0.95 * (len(ordered) - 1))]
+            line += f"  {label}: {mean_ms:.3f} / {p95_ms:.3f}"
+        print(line)
+    return results
+
 def init_tracking_db():
     """Initialize the SQLite database for longitudinal tracking"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    with tracking_db.transaction() as cursor:
+        version = migrate_tracking_db(cursor)
+    print(f"Longitudinal tracking database initialized at {DB_PATH} (schema v{version})")
+    print(f"Sync folder: {SYNC_FOLDER}")
+
+def epoch_now():
+    """Return (ISO timestamp, integer epoch seconds) for the same instant"""
+    now = datetime.now()
+    return now.isoformat(), int(now.timestamp())
+
+# ---------------- LESION PAYLOAD STORE ---------------- #
+# 'raw' or 'zlib'; ORB descriptors are near-random bits so compression is opt-in
+LESION_PAYLOAD_ENCODING = 'raw'
+
+def encode_lesion_payload(data, encoding=None):
+    """Return (encoding, payload) for storage, falling back to raw if compression doesn't help"""
+    encoding = encoding or LESION_PAYLOAD_ENCODING
+    if encoding == 'zlib':
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return 'zlib', compressed
+    return 'raw', data
+
+def decode_lesion_payload(encoding, payload):
+    if payload is None:
+        return None
+    if encoding == 'zlib':
+        return zlib.decompress(payload)
+    return bytes(payload)
+
+def store_lesion_payload(cursor, lesion_id, data, kind='orb'):
+    """Insert or replace one payload for a lesion (call from a writer job)"""
+    encoding, payload = encode_lesion_payload(data)
+    cursor.execute('''
+        INSERT INTO lesion_payloads (lesion_id, kind, encoding, raw_size, payload)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (lesion_id, kind) DO UPDATE SET
+            encoding = excluded.encoding,
+            raw_size = excluded.raw_size,
+            payload = excluded.payload
+    ''', (lesion_id, kind, encoding, len(data), payload))
+
+def load_lesion_payloads(kind='orb', cursor=None, location=None):
+    """Return [(lesion_id, decoded payload)] for every lesion that has one.
+
+    Pass a writer job's cursor to read inside that job's transaction, and a
+    body location to load only lesions recorded there (or with no location).
+    """
+    sql = 'SELECT p.lesion_id, p.encoding, p.payload FROM lesion_payloads p'
+    params = [kind]
+    if location is not None:
+        sql += ' JOIN lesions l ON l.lesion_id = p.lesion_id WHERE p.kind = ? AND (l.body_location = ? OR l.body_location IS NULL)'
+        params.append(location)
+    else:
+        sql += ' WHERE p.kind = ?'
+    rows = cursor.execute(sql, params).fetchall() if cursor is not None else tracking_db.query(sql, params)
+    return [(lesion_id, decode_lesion_payload(encoding, payload)) for lesion_id, encoding, payload in rows]
+
+# ---------------- SCHEMA MIGRATIONS ---------------- #
+# Each migration runs once, in order, inside the same transaction that bumps
+# PRAGMA user_version, so an interrupted upgrade leaves the old schema intact.
+def _migration_base_schema(cursor):
+    _create_base_schema(cursor)
+
+def _migration_epoch_columns_and_indexes(cursor):
+    cursor.execute('ALTER TABLE scans ADD COLUMN ts_epoch INTEGER')
+    cursor.execute('ALTER TABLE lesions ADD COLUMN first_seen_epoch INTEGER')
+    
+    # Existing timestamps are local-time ISO strings written by datetime.now()
+    cursor.execute("UPDATE scans SET ts_epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER) WHERE timestamp IS NOT NULL")
+    cursor.execute("UPDATE lesions SET first_seen_epoch = CAST(strftime('%s', first_seen, 'utc') AS INTEGER) WHERE first_seen IS NOT NULL")
+    
+    # Covering indexes for: per-lesion history, most recent scans, high-risk
+    # scans in a time window, and the lesion lists ordered by first_seen
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_scans_lesion_time
+    ON scans (lesion_id, ts_epoch, timestamp, prediction, confidence, risk_level, match_count)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_scans_time
+    ON scans (ts_epoch, timestamp, prediction, confidence, risk_level)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_scans_risk_time
+    ON scans (risk_level, ts_epoch, timestamp, prediction, confidence)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_lesions_first_seen
+    ON lesions (first_seen_epoch, lesion_id, body_location, first_seen, feature_count)
+    ''')
+
+def _migration_split_lesion_payloads(cursor):
+    # Descriptor BLOBs (up to tens of KB) move out of lesions so metadata scans
+    # only touch small rows; 'kind' leaves room for embeddings later
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS lesion_payloads (
+        lesion_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        encoding TEXT NOT NULL,
+        raw_size INTEGER,
+        payload BLOB,
+        PRIMARY KEY (lesion_id, kind)
+    )
+    ''')
+    cursor.execute('''
+    INSERT OR IGNORE INTO lesion_payloads (lesion_id, kind, encoding, raw_size, payload)
+    SELECT lesion_id, 'orb', 'raw', length(feature_descriptors), feature_descriptors
+    FROM lesions
+    WHERE feature_descriptors IS NOT NULL
+    ''')
     
+    # Rebuild lesions without the BLOB column (works on SQLite < 3.35 too)
+    cursor.execute('''
+    CREATE TABLE lesions_new (
+        lesion_id TEXT PRIMARY KEY,
+        first_seen TEXT,
+        body_location TEXT,
+        patient_name TEXT,
+        feature_count INTEGER,
+        first_seen_epoch INTEGER
+    )
+    ''')
+    cursor.execute('''
+    INSERT INTO lesions_new (lesion_id, first_seen, body_location, patient_name, feature_count, first_seen_epoch)
+    SELECT lesion_id, first_seen, body_location, patient_name, feature_count, first_seen_epoch
+    FROM lesions
+    ''')
+    cursor.execute('DROP TABLE lesions')
+    cursor.execute('ALTER TABLE lesions_new RENAME TO lesions')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_lesions_first_seen
+    ON lesions (first_seen_epoch, lesion_id, body_location, first_seen, feature_count)
+    ''')
+
+def _migration_summary_tables(cursor):
+    # Dashboard summaries kept current by triggers on every scan insert, so the
+    # dashboard reads a handful of small rows instead of scanning history
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS lesion_summary (
+        lesion_id TEXT PRIMARY KEY,
+        scan_count INTEGER NOT NULL DEFAULT 0,
+        first_seen_epoch INTEGER,
+        last_seen_epoch INTEGER,
+        latest_scan_id INTEGER,
+        latest_prediction TEXT,
+        latest_risk TEXT,
+        latest_confidence REAL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS daily_risk_counts (
+        day TEXT NOT NULL,
+        risk_level TEXT NOT NULL,
+        scan_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, risk_level)
+    ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_scans_lesion_summary
+    AFTER INSERT ON scans
+    WHEN NEW.lesion_id IS NOT NULL
+    BEGIN
+        INSERT INTO lesion_summary (lesion_id, scan_count, first_seen_epoch, last_seen_epoch,
+                                    latest_scan_id, latest_prediction, latest_risk, latest_confidence)
+        VALUES (NEW.lesion_id, 1, NEW.ts_epoch, NEW.ts_epoch,
+                NEW.scan_id, NEW.prediction, NEW.risk_level, NEW.confidence)
+        ON CONFLICT (lesion_id) DO UPDATE SET
+            scan_count = scan_count + 1,
+            first_seen_epoch = coalesce(min(first_seen_epoch, excluded.first_seen_epoch), first_seen_epoch, excluded.first_seen_epoch),
+            last_seen_epoch = coalesce(max(last_seen_epoch, excluded.last_seen_epoch), last_seen_epoch, excluded.last_seen_epoch),
+            latest_scan_id = CASE WHEN coalesce(excluded.last_seen_epoch >= last_seen_epoch, 1) THEN excluded.latest_scan_id ELSE latest_scan_id END,
+            latest_prediction = CASE WHEN coalesce(excluded.last_seen_epoch >= last_seen_epoch, 1) THEN excluded.latest_prediction ELSE latest_prediction END,
+            latest_risk = CASE WHEN coalesce(excluded.last_seen_epoch >= last_seen_epoch, 1) THEN excluded.latest_risk ELSE latest_risk END,
+            latest_confidence = CASE WHEN coalesce(excluded.last_seen_epoch >= last_seen_epoch, 1) THEN excluded.latest_confidence ELSE latest_confidence END;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_scans_daily_risk
+    AFTER INSERT ON scans
+    BEGIN
+        INSERT INTO daily_risk_counts (day, risk_level, scan_count)
+        VALUES (date(coalesce(NEW.ts_epoch, strftime('%s', 'now')), 'unixepoch', 'localtime'),
+                coalesce(NEW.risk_level, 'LOW'), 1)
+        ON CONFLICT (day, risk_level) DO UPDATE SET scan_count = scan_count + 1;
+    END
+    ''')
+    
+    # Backfill from existing history
+    cursor.execute('''
+    INSERT OR REPLACE INTO lesion_summary (lesion_id, scan_count, first_seen_epoch, last_seen_epoch,
+                                           latest_scan_id, latest_prediction, latest_risk, latest_confidence)
+    SELECT lesion_id, n, first_epoch, last_epoch, scan_id, prediction, risk_level, confidence
+    FROM (
+        SELECT lesion_id, scan_id, prediction, risk_level, confidence,
+               count(*) OVER lesion_scans AS n,
+               min(ts_epoch) OVER lesion_scans AS first_epoch,
+               max(ts_epoch) OVER lesion_scans AS last_epoch,
+               row_number() OVER (PARTITION BY lesion_id ORDER BY ts_epoch DESC, scan_id DESC) AS rn
+        FROM scans
+        WHERE lesion_id IS NOT NULL
+        WINDOW lesion_scans AS (PARTITION BY lesion_id)
+    )
+    WHERE rn = 1
+    ''')
+    cursor.execute('''
+    INSERT OR REPLACE INTO daily_risk_counts (day, risk_level, scan_count)
+    SELECT date(ts_epoch, 'unixepoch', 'localtime'), coalesce(risk_level, 'LOW'), count(*)
+    FROM scans
+    WHERE ts_epoch IS NOT NULL
+    GROUP BY 1, 2
+    ''')
+
+def _migration_sync_outbox(cursor):
+    # Sync records waiting for the shared folder; a row is deleted once delivered
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sync_outbox (
+        record_id TEXT PRIMARY KEY,
+        created_epoch INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_epoch INTEGER NOT NULL,
+        last_error TEXT
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_sync_outbox_due
+    ON sync_outbox (next_attempt_epoch, created_epoch)
+    ''')
+
+def _migration_synced_records(cursor):
+    # Records other devices publish to the sync folder, upserted by SyncIngester
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS synced_records (
+        source_device TEXT NOT NULL,
+        record_id TEXT NOT NULL,
+        scan_type TEXT,
+        timestamp TEXT,
+        ts_epoch INTEGER,
+        prediction TEXT,
+        confidence REAL,
+        risk_level TEXT,
+        payload TEXT NOT NULL,
+        PRIMARY KEY (source_device, record_id)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_synced_records_type_time
+    ON synced_records (scan_type, ts_epoch)
+    ''')
+    # How far each segment stream (by device) or legacy JSON file has been ingested
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sync_ingest_progress (
+        source TEXT PRIMARY KEY,
+        position INTEGER NOT NULL,
+        updated_epoch INTEGER
+    )
+    ''')
+
+def _migration_missing_blobs(cursor):
+    # Image blobs of ingested sync records that were not in the shared folder yet;
+    # SyncIngester retries these each pass and deletes a row once the copy lands
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS missing_blobs (
+        digest TEXT PRIMARY KEY,
+        first_seen_epoch INTEGER NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT
+    ) WITHOUT ROWID
+    ''')
+    # Records ingested before this table existed are checked once; rows whose
+    # blob is already local are cleared on the first retry pass
+    cursor.execute('''
+    INSERT OR IGNORE INTO missing_blobs (digest, first_seen_epoch)
+    SELECT DISTINCT json_extract(payload, '$.image_sha256'), CAST(strftime('%s', 'now') AS INTEGER)
+    FROM synced_records
+    WHERE json_extract(payload, '$.image_sha256') IS NOT NULL
+    ''')
+
+SCHEMA_MIGRATIONS = [
+    (1, _migration_base_schema),
+    (2, _migration_epoch_columns_and_indexes),
+    (3, _migration_split_lesion_payloads),
+    (4, _migration_summary_tables),
+    (5, _migration_sync_outbox),
+    (6, _migration_synced_records),
+    (7, _migration_missing_blobs),
+]
+
+def migrate_tracking_db(cursor):
+    """Bring the tracking database up to the latest schema version in place"""
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    pending = [(v, migration) for v, migration in SCHEMA_MIGRATIONS if v > version]
+    if not pending:
+        return version
+    
+    cursor.execute('BEGIN IMMEDIATE')
+    for target_version, migration in pending:
+        print(f"Migrating tracking database to schema v{target_version} ({migration.__name__})")
+        migration(cursor)
+        cursor.execute(f'PRAGMA user_version = {target_version}')
+        version = target_version
+    
+    cursor.execute('ANALYZE')
+    return version
+
+def _create_base_schema(cursor):
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS lesions (
         lesion_id TEXT PRIMARY KEY,
@@ -161,45 +693,488 @@ def init_tracking_db():
         FOREIGN KEY (lesion_id) REFERENCES lesions(lesion_id)
     )
     ''')
-    
-    conn.commit()
-    conn.close()
-    print(f"Longitudinal tracking database initialized at {DB_PATH}")
-    print(f"Sync folder: {SYNC_FOLDER}")
 
 init_tracking_db()
 
-# ---------------- ORB FEATURE EXTRACTOR ---------------- #
-def extract_lesion_features(image_array, n_features=500):
-    """Creates a unique fingerprint of a lesion using ORB with pyramid scale invariance"""
-    try:
-        if len(image_array.shape) == 3:
-            gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
+# ---------------- BACKGROUND DATABASE WRITER ---------------- #
+DB_WRITER_BATCH_SIZE = 32
+# How long the writer waits for more jobs before committing a batch (seconds)
+DB_WRITER_BATCH_WINDOW = 0.05
+
+class _WriterBarrier:
+    def __init__(self, durable):
+        self.durable = durable
+        self.done = threading.Event()
+
+class DatabaseWriter(QThread):
+    """Single thread that owns all tracking database writes.
+
+    Jobs are callables taking a cursor. Jobs queued close together are committed
+    in one transaction, each inside its own savepoint so a failing job does not
+    roll back its neighbours. Callbacks run on the GUI thread as callback(result, error),
+    and tables_changed carries the names of the tables each committed batch touched.
+    """
+    job_finished = pyqtSignal(object, object, object)
+    tables_changed = pyqtSignal(object)
+    
+    def __init__(self, database):
+        super().__init__()
+        self.database = database
+        self._queue = queue.Queue()
+        self._stopped = False
+        self.job_finished.connect(self._dispatch_callback)
+    
+    def submit(self, job, callback=None, tables=()):
+        """Queue job(cursor) for the writer thread; tables names what the job writes"""
+        if self._stopped:
+            raise RuntimeError("Database writer has been stopped")
+        self._queue.put((job, callback, frozenset(tables)))
+    
+    def flush(self, durable=False, timeout=None):
+        """Block until every job queued so far is committed (and checkpointed if durable)"""
+        barrier = _WriterBarrier(durable)
+        self._queue.put(barrier)
+        if not self.isRunning():
+            self._drain()
+        return barrier.done.wait(timeout)
+    
+    def stop(self):
+        """Commit everything still queued, checkpoint the WAL and end the thread.
+
+        Waits for the writer without a timeout: callers close the database (or
+        power off) straight after, so returning early would drop queued scans.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(None)
+        if self.isRunning():
+            self.wait()
         else:
-            gray = image_array
+            self._drain()
+        # Release anyone who called flush() after the stop sentinel
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _WriterBarrier):
+                item.done.set()
+        print("Database writer stopped")
+    
+    def run(self):
+        while self._process_next(block=True):
+            pass
+    
+    def _drain(self):
+        """Process the queue on the calling thread when the writer thread is not running"""
+        while self._process_next(block=False):
+            pass
+    
+    def _process_next(self, block):
+        """Commit one batch; returns False when stopped, or when the queue is empty and not blocking"""
+        try:
+            item = self._queue.get(block=block)
+        except queue.Empty:
+            return False
+        
+        batch = []
+        deadline = time.monotonic() + DB_WRITER_BATCH_WINDOW
+        while True:
+            if item is None:
+                self._commit_batch(batch)
+                self._checkpoint()
+                return False
+            if isinstance(item, _WriterBarrier):
+                self._commit_batch(batch)
+                batch = []
+                if item.durable:
+                    self._checkpoint()
+                item.done.set()
+            else:
+                batch.append(item)
+                if len(batch) >= DB_WRITER_BATCH_SIZE:
+                    break
+            try:
+                if block:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
         
-        gray = cv2.resize(gray, (224, 224))
-        
-        orb = cv2.ORB_create(
-            nfeatures=n_features,
-            scaleFactor=1.2,
-            nlevels=8,
-            edgeThreshold=31,
-            firstLevel=0,
-            WTA_K=2,
-            scoreType=cv2.ORB_HARRIS_SCORE,
-            patchSize=31,
-            fastThreshold=20
+        self._commit_batch(batch)
+        return True
+    
+    def _commit_batch(self, batch):
+        if not batch:
+            return
+        outcomes = []
+        changed = set()
+        try:
+            with self.database.transaction() as cursor:
+                cursor.execute('BEGIN IMMEDIATE')
+                for job, callback, tables in batch:
+                    cursor.execute('SAVEPOINT writer_job')
+                    try:
+                        result = job(cursor)
+                        cursor.execute('RELEASE writer_job')
+                        outcomes.append((callback, result, None))
+                        changed |= tables
+                    except Exception as e:
+                        cursor.execute('ROLLBACK TO writer_job')
+                        cursor.execute('RELEASE writer_job')
+                        print(f"Database write failed: {e}")
+                        outcomes.append((callback, None, e))
+        except Exception as e:
+            print(f"Database batch commit failed: {e}")
+            outcomes = [(callback, None, e) for _, callback, _ in batch]
+            changed = set()
+        
+        if changed:
+            self.tables_changed.emit(frozenset(changed))
+        for callback, result, error in outcomes:
+            if callback is not None:
+                self.job_finished.emit(callback, result, error)
+    
+    def _checkpoint(self):
+        """Copy the WAL into the main database file with a full fsync"""
+        try:
+            with self.database._write_lock:
+                self.database.writer().execute('PRAGMA wal_checkpoint(FULL)')
+        except Exception as e:
+            print(f"WAL checkpoint failed: {e}")
+    
+    def _dispatch_callback(self, callback, result, error):
+        try:
+            callback(result, error)
+        except Exception as e:
+            print(f"Database write callback error: {e}")
+
+db_writer = DatabaseWriter(tracking_db)
+
+# Tables touched by a scan insert (the summary tables are updated by triggers)
+SCAN_WRITE_TABLES = ('scans', 'lesion_summary', 'daily_risk_counts')
+
+def insert_scan(cursor, **values):
+    """Insert one row into scans from column=value keywords; returns the new scan_id"""
+    columns = list(values)
+    cursor.execute(f"INSERT INTO scans ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                   [values[column] for column in columns])
+    return cursor.lastrowid
+
+# ---------------- SCAN ARCHIVE ---------------- #
+# Scans older than this many days move from the hot database to the archive.
+# lesion_summary and daily_risk_counts stay in the hot database: their triggers
+# only fire on INSERT, so deleting archived scans leaves them intact.
+SCAN_RETENTION_DAYS = 180
+# Scans moved per writer job, so archival never holds the write lock for long
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_INTERVAL_MS = 6 * 60 * 60 * 1000
+
+def _oldest_scans_query(table):
+    return f'''
+        SELECT scan_id FROM {table}
+        WHERE ts_epoch < ?
+        ORDER BY ts_epoch, scan_id
+        LIMIT ?
+    '''
+
+def _archive_cutoff(horizon_days):
+    return int((datetime.now() - timedelta(days=horizon_days)).timestamp())
+
+def copy_old_scans_to_archive(cursor, horizon_days=SCAN_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Copy up to batch_size scans older than horizon_days into archive.scans.
+
+    First half of archival, run as its own DatabaseWriter job; returns the number
+    of scans copied. SQLite does not commit atomically across attached WAL
+    databases, so the originals are only deleted by delete_archived_scans once
+    this copy has committed. A copy whose delete never ran is copied again next
+    time (INSERT OR REPLACE).
+    """
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO archive.scans ({SCAN_COLUMNS})
+        SELECT {SCAN_COLUMNS} FROM main.scans
+        WHERE scan_id IN ({_oldest_scans_query('main.scans')})
+    ''', (_archive_cutoff(horizon_days), batch_size))
+    return cursor.rowcount
+
+def delete_archived_scans(cursor, horizon_days=SCAN_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Delete up to batch_size old scans from main.scans that archive.scans already holds.
+
+    Second half of archival; writes only the hot database. Returns the number deleted.
+    """
+    cursor.execute('''
+        DELETE FROM main.scans
+        WHERE scan_id IN (
+            SELECT m.scan_id FROM main.scans AS m
+            JOIN archive.scans AS a ON a.scan_id = m.scan_id
+            WHERE m.ts_epoch < ?
+            ORDER BY m.ts_epoch, m.scan_id
+            LIMIT ?
         )
-        keypoints, descriptors = orb.detectAndCompute(gray, None)
-        
-        if descriptors is not None and len(descriptors) > 0:
-            return descriptors.tobytes(), len(keypoints)
+    ''', (_archive_cutoff(horizon_days), batch_size))
+    return cursor.rowcount
+
+# ---------------- ONLINE BACKUP ---------------- #
+BACKUP_DIR = os.path.join(HOME_DIR, "noma_ai", "backups")
+# Pages copied per backup step; small steps keep every read short on the SD card
+BACKUP_PAGES_PER_STEP = 64
+# Pause between steps (seconds) so the backup never competes with a scan for I/O
+BACKUP_STEP_PAUSE = 0.02
+BACKUP_INTERVAL_MS = 24 * 60 * 60 * 1000
+# Delay before the startup check, so the camera and model load first
+BACKUP_STARTUP_DELAY_MS = 2 * 60 * 1000
+# Nice value for the backup thread; without an explicit ionice class the kernel
+# derives its I/O priority from this too, so 19 is also the lowest best-effort I/O
+BACKUP_NICE = 19
+IMAGE_MANIFEST_NAME = "image_manifest.json"
+
+def backup_database(source_path, dest_path, pages_per_step=BACKUP_PAGES_PER_STEP,
+                    pause=BACKUP_STEP_PAUSE, is_busy=None, cancelled=None):
+    """Copy a live SQLite database to dest_path with the online backup API.
+
+    The copy is read inside one read transaction, so it is a consistent snapshot
+    that commits made meanwhile cannot restart, and WAL writers are never blocked.
+    Between steps the copy sleeps, and waits while is_busy() is true. Returns
+    (pages, bytes) of the finished copy.
+    """
+    partial_path = dest_path + ".partial"
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+    
+    copied = {'pages': 0}
+    
+    def step(status, remaining, total):
+        copied['pages'] = total - remaining
+        if cancelled is not None and cancelled():
+            raise InterruptedError("backup cancelled")
+        while is_busy is not None and is_busy():
+            time.sleep(0.5)
+        time.sleep(pause)
+    
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True, isolation_level=None)
+    target = sqlite3.connect(partial_path)
+    try:
+        source.execute('BEGIN')
+        source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        source.backup(target, pages=pages_per_step, progress=step)
+        source.execute('COMMIT')
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial_path, dest_path)
+    return copied['pages'], os.path.getsize(dest_path)
+
+def backup_images(image_dir, backup_image_dir, manifest_path, is_busy=None, cancelled=None):
+    """Copy tracked images that are new or changed since the last backup.
+
+    The manifest maps each relative path to [size, mtime_ns]; only files whose entry
+    differs are copied. Images deleted from image_dir stay in the backup. Returns
+    (copied, bytes_copied, removed).
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    
+    current = {}
+    copied = bytes_copied = 0
+    for root, _, files in os.walk(image_dir):
+        for name in files:
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, image_dir)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = [stat.st_size, stat.st_mtime_ns]
+            current[rel_path] = entry
+            if previous.get(rel_path) == entry:
+                continue
+            if cancelled is not None and cancelled():
+                raise InterruptedError("backup cancelled")
+            while is_busy is not None and is_busy():
+                time.sleep(0.5)
+            dest = os.path.join(backup_image_dir, rel_path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(path, dest)
+            copied += 1
+            bytes_copied += stat.st_size
+    
+    removed = len(set(previous) - set(current))
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(current, f)
+    os.replace(tmp_path, manifest_path)
+    return copied, bytes_copied, removed
+
+def run_backup(backup_dir=BACKUP_DIR, is_busy=None, cancelled=None):
+    """Back up the tracking and archive databases plus tracked images; returns a report dict"""
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.perf_counter()
+    report = {'started': datetime.now().isoformat()}
+    total_bytes = 0
+    
+    for name, path in (('tracking_db', DB_PATH), ('archive_db', ARCHIVE_DB_PATH)):
+        if not os.path.exists(path):
+            continue
+        t0 = time.perf_counter()
+        dest = os.path.join(backup_dir, os.path.basename(path))
+        pages, size = backup_database(path, dest, is_busy=is_busy, cancelled=cancelled)
+        check = sqlite3.connect(dest)
+        try:
+            quick_check = check.execute('PRAGMA quick_check').fetchone()[0]
+        finally:
+            check.close()
+        report[name] = {'pages': pages, 'bytes': size, 'seconds': round(time.perf_counter() - t0, 2),
+                        'quick_check': quick_check}
+        total_bytes += size
+    
+    t0 = time.perf_counter()
+    copied, bytes_copied, removed = backup_images(
+        TRACKED_IMAGES_DIR, os.path.join(backup_dir, "tracked_lesions"),
+        os.path.join(backup_dir, IMAGE_MANIFEST_NAME), is_busy=is_busy, cancelled=cancelled)
+    report['images'] = {'copied': copied, 'bytes': bytes_copied, 'removed_since_last': removed,
+                        'seconds': round(time.perf_counter() - t0, 2)}
+    total_bytes += bytes_copied
+    
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 2)
+    report['mb_per_second'] = round(total_bytes / 1e6 / elapsed, 2) if elapsed > 0 else 0.0
+    with open(os.path.join(backup_dir, "last_backup.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def backup_is_due(backup_dir=BACKUP_DIR, interval_ms=BACKUP_INTERVAL_MS):
+    """True when no backup has finished within the last interval (or ever)"""
+    try:
+        finished = os.path.getmtime(os.path.join(backup_dir, "last_backup.json"))
+    except OSError:
+        return True
+    return (time.time() - finished) * 1000 >= interval_ms
+
+class BackupThread(QThread):
+    """Runs run_backup() off the GUI thread at the lowest CPU and I/O priority.
+
+    QThread priorities do nothing under Linux's default scheduler, so the thread
+    lowers its own nice value instead (per-thread on Linux).
+    """
+    backup_finished = pyqtSignal(object)
+    
+    def __init__(self, is_busy=None):
+        super().__init__()
+        self.is_busy = is_busy
+    
+    def run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKUP_NICE)
+        except (AttributeError, OSError) as e:
+            print(f"Could not lower backup priority: {e}")
+        try:
+            report = run_backup(is_busy=self.is_busy, cancelled=self.isInterruptionRequested)
+        except Exception as e:
+            report = {'error': str(e)}
+        self.backup_finished.emit(report)
+
+# ---------------- ORB FEATURE EXTRACTOR ---------------- #
+ORB_DESCRIPTOR_SIZE = 32
+# Per-lesion descriptor budget: ~1500 ORB descriptors merged across scans
+LESION_DESCRIPTOR_BUDGET_BYTES = 48000
+# Hamming distance (bits) below which two descriptors are treated as the same feature
+DESCRIPTOR_DEDUP_DISTANCE = 32
+
+ORB_INPUT_SIZE = (224, 224)
+
+class ORBFeatureEngine:
+    """Caches ORB detectors, matchers and grayscale buffers per thread.
+
+    OpenCV feature objects are not safe to share between threads, so each thread
+    keeps its own detector per configuration and its own resize buffers.
+    """
+    
+    def __init__(self, input_size=ORB_INPUT_SIZE):
+        self.input_size = input_size
+        self._local = threading.local()
+    
+    def _cache(self):
+        local = self._local
+        if not hasattr(local, 'detectors'):
+            local.detectors = {}
+            local.matchers = {}
+            local.gray_buffers = {}
+            local.resized = np.empty((self.input_size[1], self.input_size[0]), dtype=np.uint8)
+        return local
+    
+    def detector(self, n_features=500):
+        """Return this thread's ORB detector for the given feature budget"""
+        detectors = self._cache().detectors
+        orb = detectors.get(n_features)
+        if orb is None:
+            orb = cv2.ORB_create(
+                nfeatures=n_features,
+                scaleFactor=1.2,
+                nlevels=8,
+                edgeThreshold=31,
+                firstLevel=0,
+                WTA_K=2,
+                scoreType=cv2.ORB_HARRIS_SCORE,
+                patchSize=31,
+                fastThreshold=20
+            )
+            detectors[n_features] = orb
+        return orb
+    
+    def matcher(self, norm_type=cv2.NORM_HAMMING, cross_check=False):
+        """Return this thread's brute-force matcher for the given configuration"""
+        matchers = self._cache().matchers
+        key = (norm_type, cross_check)
+        bf = matchers.get(key)
+        if bf is None:
+            bf = cv2.BFMatcher(norm_type, crossCheck=cross_check)
+            matchers[key] = bf
+        return bf
+    
+    def _prepare_gray(self, image_array):
+        """Grayscale and resize into this thread's reusable buffers"""
+        cache = self._cache()
+        if len(image_array.shape) == 3:
+            shape = image_array.shape[:2]
+            gray = cache.gray_buffers.get(shape)
+            if gray is None:
+                gray = np.empty(shape, dtype=np.uint8)
+                cache.gray_buffers[shape] = gray
+            cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY, dst=gray)
         else:
+            gray = image_array
+        return cv2.resize(gray, self.input_size, dst=cache.resized)
+    
+    def extract(self, image_array, n_features=500):
+        """Return (descriptor bytes, keypoint count) for one frame"""
+        try:
+            gray = self._prepare_gray(image_array)
+            keypoints, descriptors = self.detector(n_features).detectAndCompute(gray, None)
+            
+            if descriptors is not None and len(descriptors) > 0:
+                return descriptors.tobytes(), len(keypoints)
+            else:
+                return None, 0
+        except Exception as e:
+            print(f"Feature extraction error: {e}")
             return None, 0
-    except Exception as e:
-        print(f"Feature extraction error: {e}")
-        return None, 0
+    
+    def extract_many(self, frames, n_features=500):
+        """Extract fingerprints for a batch of frames, reusing the same buffers"""
+        return [self.extract(frame, n_features) for frame in frames]
+
+orb_engine = ORBFeatureEngine()
+
+def extract_lesion_features(image_array, n_features=500):
+    """Creates a unique fingerprint of a lesion using ORB with pyramid scale invariance"""
+    return orb_engine.extract(image_array, n_features)
 
 def compare_lesions(descriptors1_bytes, descriptors2_bytes, match_threshold=35):
     """Compares two lesion fingerprints using ORB with Lowe's ratio test"""
@@ -219,8 +1194,7 @@ def compare_lesions(descriptors1_bytes, descriptors2_bytes, match_threshold=35):
         desc1 = desc1.reshape((-1, 32))
         desc2 = desc2.reshape((-1, 32))
         
-        bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
-        matches = bf.knnMatch(desc1, desc2, k=2)
+        matches = orb_engine.matcher().knnMatch(desc1, desc2, k=2)
         
         good_matches = []
         for match_pair in matches:
@@ -245,46 +1219,737 @@ def compare_lesions(descriptors1_bytes, descriptors2_bytes, match_threshold=35):
         
         return match_score, raw_match_count, is_same
         
-    except Exception as e:
-        print(f"Comparison error: {e}")
-        return 0.0, 0, False
-
-def detect_changes(old_scan, new_scan):
-    """Compare two scans of the same lesion and report changes"""
-    changes = []
+    except Exception as e:
+        print(f"Comparison error: {e}")
+        return 0.0, 0, False
+
+def merge_lesion_descriptors(stored_bytes, new_bytes, budget_bytes=LESION_DESCRIPTOR_BUDGET_BYTES,
+                             dedup_distance=DESCRIPTOR_DEDUP_DISTANCE):
+    """Merge a matched scan's ORB descriptors into a lesion's stored descriptor set.
+
+    Stored descriptors re-observed in the new scan move to the front, unseen new
+    descriptors follow, and stored descriptors that were not re-observed are the
+    first to be evicted once the set exceeds the byte budget.
+    """
+    try:
+        stored = np.frombuffer(stored_bytes, dtype=np.uint8) if stored_bytes else np.empty(0, dtype=np.uint8)
+        new = np.frombuffer(new_bytes, dtype=np.uint8) if new_bytes else np.empty(0, dtype=np.uint8)
+        
+        if len(stored) % ORB_DESCRIPTOR_SIZE != 0 or len(new) % ORB_DESCRIPTOR_SIZE != 0:
+            return stored_bytes, len(stored) // ORB_DESCRIPTOR_SIZE
+        
+        stored = stored.reshape((-1, ORB_DESCRIPTOR_SIZE))
+        new = new.reshape((-1, ORB_DESCRIPTOR_SIZE))
+        
+        if len(new) == 0:
+            return stored_bytes, len(stored)
+        
+        if len(stored) == 0:
+            merged = new
+        else:
+            matches = orb_engine.matcher().match(new, stored)
+            
+            confirmed = np.zeros(len(stored), dtype=bool)
+            duplicate = np.zeros(len(new), dtype=bool)
+            for m in matches:
+                if m.distance <= dedup_distance:
+                    confirmed[m.trainIdx] = True
+                    duplicate[m.queryIdx] = True
+            
+            merged = np.concatenate([stored[confirmed], new[~duplicate], stored[~confirmed]])
+        
+        max_descriptors = max(1, budget_bytes // ORB_DESCRIPTOR_SIZE)
+        merged = np.ascontiguousarray(merged[:max_descriptors])
+        return merged.tobytes(), len(merged)
+        
+    except Exception as e:
+        print(f"Descriptor merge error: {e}")
+        return stored_bytes, len(stored_bytes) // ORB_DESCRIPTOR_SIZE if stored_bytes else 0
+
+RISK_ORDER = {'LOW': 0, 'MODERATE': 1, 'HIGH': 2, 'URGENT': 3}
+
+def describe_scan_delta(prev_prediction, prediction, prev_risk, risk_level, confidence_delta=None):
+    """Describe what changed between two consecutive scans of the same lesion"""
+    changes = []
+    
+    if confidence_delta is not None and confidence_delta > 0.2:
+        changes.append(f"AI confidence increased by {confidence_delta*100:.0f}%")
+    
+    if prev_prediction is not None and prediction != prev_prediction:
+        changes.append(f"Diagnosis changed from {prev_prediction} to {prediction}")
+    
+    if prev_risk is not None and risk_level != prev_risk:
+        step = RISK_ORDER.get(risk_level, 0) - RISK_ORDER.get(prev_risk, 0)
+        direction = "increased" if step > 0 else "decreased" if step < 0 else "changed"
+        changes.append(f"Risk level {direction} from {prev_risk} to {risk_level}")
+    
+    return changes
+
+def detect_changes(old_scan, new_scan):
+    """Compare two scans of the same lesion and report changes"""
+    return describe_scan_delta(
+        old_scan.get('prediction', 'unknown'), new_scan.get('prediction', 'unknown'),
+        old_scan.get('risk_level', 'LOW'), new_scan.get('risk_level', 'LOW'),
+        new_scan.get('confidence', 0) - old_scan.get('confidence', 0))
+
+# ---------------- IMAGE BLOB STORE ---------------- #
+# Tracked photos are stored once per distinct capture, named by the SHA-256 of their pixels
+IMAGE_BLOB_DIR = os.path.join(TRACKED_IMAGES_DIR, "blobs")
+# Blobs published for other devices, laid out the same way
+SHARED_BLOB_DIR = os.path.join(SYNC_FOLDER, "blobs")
+# JPEG quality for stored photos; above PIL's default of 75 to keep fine pigment detail
+IMAGE_JPEG_QUALITY = 90
+
+def image_blob_path(digest, root=IMAGE_BLOB_DIR):
+    """Path of a blob, sharded into 256 directories by the first hash byte"""
+    return os.path.join(root, digest[:2], f"{digest}.jpg")
+
+def image_pixel_hash(image_array):
+    """SHA-256 over the raw pixels, shape and dtype; identical captures hash the same"""
+    digest = hashlib.sha256(f"{image_array.shape}:{image_array.dtype}:".encode())
+    digest.update(np.ascontiguousarray(image_array).data)
+    return digest.hexdigest()
+
+def copy_image_blob(digest, source_root, dest_root):
+    """Copy one blob between stores unless the destination has it; returns True if copied"""
+    dest = image_blob_path(digest, dest_root)
+    if os.path.exists(dest):
+        return False
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = f"{dest}.{uuid.uuid4().hex}.tmp"
+    shutil.copyfile(image_blob_path(digest, source_root), tmp_path)
+    os.replace(tmp_path, dest)
+    return True
+
+class ImageBlobStore:
+    """Content-addressed JPEG store for tracked lesion photos.
+
+    put() hashes the pixels on the caller's thread and returns the blob path at
+    once; JPEG encoding happens on a background worker and the file is renamed
+    into place when complete. A capture already stored or queued is not encoded
+    again.
+    """
+    
+    def __init__(self, root=IMAGE_BLOB_DIR, quality=IMAGE_JPEG_QUALITY):
+        self.root = root
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-blobs")
+        self._pending = {}
+        self._lock = threading.RLock()
+    
+    def put(self, image_array):
+        """Store an RGB uint8 image; returns (digest, path)"""
+        digest = image_pixel_hash(image_array)
+        path = image_blob_path(digest, self.root)
+        with self._lock:
+            if digest in self._pending or os.path.exists(path):
+                return digest, path
+            # Copy: the caller's frame buffer may be reused before the encode runs
+            future = self._executor.submit(self._encode, np.array(image_array, copy=True), path)
+            self._pending[digest] = future
+        future.add_done_callback(lambda done, digest=digest: self._finished(digest, done))
+        return digest, path
+    
+    def _encode(self, pixels, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        Image.fromarray(pixels).save(tmp_path, format='JPEG', quality=self.quality, optimize=True)
+        os.replace(tmp_path, path)
+    
+    def _finished(self, digest, future):
+        with self._lock:
+            self._pending.pop(digest, None)
+        if future.exception() is not None:
+            print(f"Image blob encode error ({digest[:12]}): {future.exception()}")
+    
+    def has(self, digest):
+        return os.path.exists(image_blob_path(digest, self.root))
+    
+    def wait(self, digest, timeout=None):
+        """Wait for a queued encode of digest to finish; returns whether the blob exists"""
+        with self._lock:
+            future = self._pending.get(digest)
+        if future is not None:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+        return self.has(digest)
+    
+    def shutdown(self):
+        """Finish every queued encode"""
+        self._executor.shutdown(wait=True)
+
+image_blobs = ImageBlobStore()
+
+# ---------------- SYNC SEGMENT WRITER ---------------- #
+# Name this device publishes under in the shared sync folder
+SYNC_DEVICE_ID = 'NOMA_AI'
+
+def json_default(value):
+    """json.dumps fallback for numpy scalars and anything else without a JSON type"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+# A sealed segment holds at most this many bytes or this many seconds of records
+SYNC_SEGMENT_MAX_BYTES = 1024 * 1024
+SYNC_SEGMENT_MAX_AGE = 300
+# Sealed segments listed in the manifest; older ones stay on disk but drop off the list
+SYNC_MANIFEST_KEEP = 1000
+
+class SyncSegmentWriter:
+    """Append-only JSON-lines segments in the shared sync folder.
+
+    Records are appended as compact lines to a hidden .jsonl.part segment. Once it
+    passes max_bytes or max_age seconds it is fsynced and renamed to .jsonl, and the
+    device manifest (noma_<device>_manifest.json) is atomically rewritten with the
+    segment's byte offset in the device's record stream. Consumers remember the
+    last offset they read and open only the segments after it.
+    """
+    
+    def __init__(self, folder, device=SYNC_DEVICE_ID, max_bytes=SYNC_SEGMENT_MAX_BYTES,
+                 max_age=SYNC_SEGMENT_MAX_AGE):
+        self.folder = folder
+        self.device = device
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.manifest_path = os.path.join(folder, f"noma_{device}_manifest.json")
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._file = None
+        self._segment = None
+    
+    def append(self, record):
+        """Append one record; rotates the segment when it is full"""
+        line = (json.dumps(record, separators=(',', ':'), default=json_default) + '\n').encode('utf-8')
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+            segment = self._segment
+            segment['bytes'] += len(line)
+            segment['records'] += 1
+            if segment['first_timestamp'] is None:
+                segment['first_timestamp'] = record.get('timestamp')
+            segment['last_timestamp'] = record.get('timestamp')
+            if segment['bytes'] >= self.max_bytes:
+                self._rotate()
+    
+    def sync(self):
+        """fsync the open segment so everything appended so far survives power loss"""
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+    
+    def rotate_if_due(self):
+        """Seal the open segment once it is older than max_age; call periodically"""
+        with self._lock:
+            if self._file is not None and time.monotonic() - self._segment['opened'] >= self.max_age:
+                try:
+                    self._rotate()
+                except OSError as e:
+                    print(f"Sync segment rotation error: {e}")
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._rotate()
+                except OSError as e:
+                    print(f"Sync segment rotation error: {e}")
+    
+    def _load_manifest(self):
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {'device': self.device, 'next_offset': 0, 'next_sequence': 0, 'segments': []}
+            self._recover()
+        return self._manifest
+    
+    def _recover(self):
+        """Seal segments a previous run left open, dropping any torn last line"""
+        prefix = f"noma_{self.device}_"
+        for name in sorted(os.listdir(self.folder)):
+            if not (name.startswith(prefix) and name.endswith('.jsonl.part')):
+                continue
+            path = os.path.join(self.folder, name)
+            with open(path, 'rb+') as f:
+                data = f.read()
+                end = data.rfind(b'\n') + 1
+                f.truncate(end)
+            lines = data[:end].splitlines()
+            if not lines:
+                os.remove(path)
+                continue
+            self._seal(path, name[:-len('.part')], end, len(lines),
+                       self._line_timestamp(lines[0]), self._line_timestamp(lines[-1]))
+    
+    @staticmethod
+    def _line_timestamp(line):
+        try:
+            return json.loads(line).get('timestamp')
+        except ValueError:
+            return None
+    
+    def _open_segment(self):
+        manifest = self._load_manifest()
+        name = f"noma_{self.device}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{manifest['next_sequence']:06d}.jsonl"
+        manifest['next_sequence'] += 1
+        path = os.path.join(self.folder, name + '.part')
+        self._file = open(path, 'ab')
+        self._segment = {'name': name, 'path': path, 'opened': time.monotonic(), 'bytes': 0,
+                         'records': 0, 'first_timestamp': None, 'last_timestamp': None}
+    
+    def _rotate(self):
+        segment = self._segment
+        try:
+            os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+            self._file = None
+            self._segment = None
+        self._seal(segment['path'], segment['name'], segment['bytes'], segment['records'],
+                   segment['first_timestamp'], segment['last_timestamp'])
+    
+    def _seal(self, part_path, name, size, records, first_timestamp, last_timestamp):
+        manifest = self._manifest
+        os.replace(part_path, os.path.join(self.folder, name))
+        sequence = int(name.rsplit('_', 1)[1].split('.')[0])
+        manifest['next_sequence'] = max(manifest['next_sequence'], sequence + 1)
+        manifest['segments'].append({
+            'name': name, 'offset': manifest['next_offset'], 'bytes': size, 'records': records,
+            'first_timestamp': first_timestamp, 'last_timestamp': last_timestamp})
+        manifest['segments'] = manifest['segments'][-SYNC_MANIFEST_KEEP:]
+        manifest['next_offset'] += size
+        manifest['updated'] = datetime.now().isoformat()
+        
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+sync_segments = SyncSegmentWriter(SYNC_FOLDER)
+
+# ---------------- SYNC OUTBOX ---------------- #
+SYNC_OUTBOX_BATCH_SIZE = 100
+# Retry delay doubles per failed attempt, from the base up to the cap (seconds)
+SYNC_RETRY_BASE_SECONDS = 5
+SYNC_RETRY_MAX_SECONDS = 600
+# Longest the worker sleeps without being woken by a new record (seconds)
+SYNC_OUTBOX_POLL_SECONDS = 60
+# Longest wait for a just-tracked photo's blob encode before syncing its record
+SYNC_BLOB_WAIT_SECONDS = 10
+
+def enqueue_sync_record(cursor, scan_data):
+    """Add a scan to the sync outbox as part of the caller's write; returns its record_id.
+
+    The record_id travels with the record, so a batch delivered twice (for example
+    after a crash before the outbox rows were deleted) can be de-duplicated downstream.
+    """
+    record = dict(scan_data)
+    record.setdefault('record_id', uuid.uuid4().hex)
+    record['source_device'] = SYNC_DEVICE_ID
+    record['scan_type'] = 'skin'
+    record['timestamp'] = datetime.now().isoformat()
+    now = int(time.time())
+    cursor.execute('''
+        INSERT OR IGNORE INTO sync_outbox (record_id, created_epoch, payload, next_attempt_epoch)
+        VALUES (?, ?, ?, ?)
+    ''', (record['record_id'], now, json.dumps(record, separators=(',', ':'), default=json_default), now))
+    return record['record_id']
+
+class SyncOutboxWorker(QThread):
+    """Delivers sync_outbox records to the shared folder's segment log.
+
+    Due records are appended in batches and fsynced before their outbox rows are
+    deleted. When the share is missing or a write fails, the batch is rescheduled
+    with exponential backoff, so a scan is never lost and never waits on the share.
+    Segment rotation and the final seal also run here, so no file I/O on the
+    share ever happens on the GUI thread.
+    """
+    
+    def __init__(self, db, writer, segments, folder):
+        super().__init__()
+        self.db = db
+        self.writer = writer
+        self.segments = segments
+        self.folder = folder
+        self._wake = threading.Event()
+        self._running = True
+    
+    def wake(self):
+        """Deliver pending records now instead of at the next poll"""
+        self._wake.set()
+    
+    def stop(self, timeout=5.0):
+        self._running = False
+        self._wake.set()
+        if self.isRunning():
+            self.wait(int(timeout * 1000))
+    
+    def run(self):
+        while self._running:
+            try:
+                delay = self._deliver_due()
+            except Exception as e:
+                print(f"Sync outbox error: {e}")
+                delay = SYNC_RETRY_BASE_SECONDS
+            # Wakes at least every SYNC_OUTBOX_POLL_SECONDS, well inside SYNC_SEGMENT_MAX_AGE
+            self.segments.rotate_if_due()
+            self._wake.wait(delay)
+            self._wake.clear()
+        self.segments.close()
+    
+    def _deliver_due(self):
+        """Deliver every due record; returns seconds until the next one falls due"""
+        while self._running:
+            rows = self.db.query('''
+                SELECT record_id, payload
+                FROM sync_outbox
+                WHERE next_attempt_epoch <= ?
+                ORDER BY next_attempt_epoch, created_epoch
+                LIMIT ?
+            ''', (int(time.time()), SYNC_OUTBOX_BATCH_SIZE))
+            if not rows:
+                break
+            record_ids = [row[0] for row in rows]
+            
+            try:
+                if not (os.path.isdir(self.folder) and os.access(self.folder, os.W_OK)):
+                    raise OSError(f"sync folder {self.folder} is unavailable")
+                records = [json.loads(payload) for _, payload in rows]
+                # Publish each referenced image before the record that points at it
+                for record in records:
+                    digest = record.get('image_sha256')
+                    if not digest:
+                        continue
+                    if not image_blobs.wait(digest, timeout=SYNC_BLOB_WAIT_SECONDS):
+                        # The encode failed and the pixels are gone: retrying cannot help,
+                        # and must not hold back the records queued behind this one
+                        print(f"Image blob {digest[:12]} is missing; syncing record "
+                              f"{record.get('record_id')} without its image")
+                        record['image_sha256'] = None
+                        continue
+                    copy_image_blob(digest, IMAGE_BLOB_DIR, SHARED_BLOB_DIR)
+                for record in records:
+                    self.segments.append(record)
+                self.segments.sync()
+            except Exception as e:
+                print(f"Sync delivery failed, will retry: {e}")
+                self._write(self._reschedule_job(record_ids, str(e)))
+                break
+            
+            self._write(self._delete_job(record_ids))
+            print(f"Synced {len(record_ids)} records to {self.folder}")
+        
+        next_due = self.db.query_one('SELECT MIN(next_attempt_epoch) FROM sync_outbox')[0]
+        if next_due is None:
+            return SYNC_OUTBOX_POLL_SECONDS
+        return max(1, min(SYNC_OUTBOX_POLL_SECONDS, next_due - int(time.time())))
+    
+    def _write(self, job):
+        try:
+            self.writer.submit(job, tables=('sync_outbox',))
+        except RuntimeError:
+            # The writer has stopped: the app is closing and the rows stay queued
+            self._running = False
+            return
+        self.writer.flush()
+    
+    @staticmethod
+    def _delete_job(record_ids):
+        def job(cursor):
+            cursor.executemany('DELETE FROM sync_outbox WHERE record_id = ?',
+                               [(record_id,) for record_id in record_ids])
+        return job
+    
+    @staticmethod
+    def _reschedule_job(record_ids, error):
+        def job(cursor):
+            cursor.executemany('''
+                UPDATE sync_outbox
+                SET attempts = attempts + 1,
+                    last_error = ?,
+                    next_attempt_epoch = ? + min(?, ? << min(attempts, 16))
+                WHERE record_id = ?
+            ''', [(error, int(time.time()), SYNC_RETRY_MAX_SECONDS, SYNC_RETRY_BASE_SECONDS, record_id)
+                  for record_id in record_ids])
+        return job
+
+sync_outbox = SyncOutboxWorker(tracking_db, db_writer, sync_segments, SYNC_FOLDER)
+
+# ---------------- SYNC INGESTER ---------------- #
+# Rescan interval (seconds); inotify only sees local writes, not ones made over a network mount
+SYNC_INGEST_POLL_SECONDS = 30
+# Records upserted per writer job while catching up on a backlog
+SYNC_INGEST_BATCH_SIZE = 500
+# How long (seconds) a listed segment may stay unreadable before it is skipped; gives
+# a folder sync time to deliver a segment that arrives after its manifest
+SYNC_SEGMENT_SKIP_SECONDS = 60 * 60
+
+def sync_record_row(record, fallback_id, fallback_device='unknown'):
+    """Map a sync record to a synced_records row (payload keeps the full record)"""
+    timestamp = record.get('timestamp')
+    try:
+        ts_epoch = int(datetime.fromisoformat(timestamp).timestamp())
+    except (TypeError, ValueError):
+        ts_epoch = None
+    try:
+        confidence = float(record.get('confidence'))
+    except (TypeError, ValueError):
+        confidence = None
+    return (record.get('source_device') or fallback_device, str(record.get('record_id') or fallback_id),
+            record.get('scan_type'), timestamp, ts_epoch, record.get('prediction'), confidence,
+            record.get('risk_level'), json.dumps(record, separators=(',', ':')))
+
+class SyncIngester(QThread):
+    """Indexes records other devices publish to the sync folder into synced_records.
+
+    Segment streams are read from each device's manifest starting at the last
+    ingested offset; legacy one-file-per-record JSON files are ingested once per
+    file size. Progress is saved in the same writer job as the upserted rows.
+    inotify_simple, when installed, wakes the ingester as soon as a file lands;
+    the folder is also rescanned every SYNC_INGEST_POLL_SECONDS. A segment that
+    stays unreadable for SYNC_SEGMENT_SKIP_SECONDS is skipped and recorded in
+    sync_ingest_progress as skipped:<device>:<segment>, so one lost file cannot
+    stall that device's stream. Image blobs that have not arrived yet are listed
+    in missing_blobs and fetched again on every pass until they do.
+    """
+    
+    UPSERT_SQL = '''
+        INSERT INTO synced_records (source_device, record_id, scan_type, timestamp, ts_epoch,
+                                    prediction, confidence, risk_level, payload)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (source_device, record_id) DO UPDATE SET
+            scan_type = excluded.scan_type,
+            timestamp = excluded.timestamp,
+            ts_epoch = excluded.ts_epoch,
+            prediction = excluded.prediction,
+            confidence = excluded.confidence,
+            risk_level = excluded.risk_level,
+            payload = excluded.payload
+    '''
+    PROGRESS_SQL = '''
+        INSERT INTO sync_ingest_progress (source, position, updated_epoch)
+        VALUES (?, ?, ?)
+        ON CONFLICT (source) DO UPDATE SET
+            position = excluded.position,
+            updated_epoch = excluded.updated_epoch
+    '''
+    MISSING_BLOB_SQL = '''
+        INSERT INTO missing_blobs (digest, first_seen_epoch, attempts, last_error)
+        VALUES (?, ?, 1, ?)
+        ON CONFLICT (digest) DO UPDATE SET
+            attempts = attempts + 1,
+            last_error = excluded.last_error
+    '''
+    
+    def __init__(self, db, writer, folder, own_device=SYNC_DEVICE_ID):
+        super().__init__()
+        self.db = db
+        self.writer = writer
+        self.folder = folder
+        self.own_device = own_device
+        self._progress = None
+        self._pending = []
+        self._pending_progress = {}
+        self._pending_missing = {}
+        self._unreadable_since = {}
+        self._running = True
+        self._wake = threading.Event()
+        self.inotify = None
+        try:
+            from inotify_simple import INotify, flags
+            self.inotify = INotify()
+            self.inotify.add_watch(folder, flags.CLOSE_WRITE | flags.MOVED_TO)
+            print("Watching sync folder with inotify")
+        except (ImportError, OSError) as e:
+            print(f"inotify unavailable, polling sync folder: {e}")
+            self.inotify = None
+    
+    def stop(self, timeout=5.0):
+        self._running = False
+        self._wake.set()
+        if self.isRunning():
+            self.wait(int(timeout * 1000))
+    
+    def run(self):
+        while self._running:
+            try:
+                self.ingest()
+            except Exception as e:
+                print(f"Sync ingest error: {e}")
+            self._wait_for_changes()
+    
+    def _wait_for_changes(self):
+        if self.inotify is None:
+            self._wake.wait(SYNC_INGEST_POLL_SECONDS)
+            self._wake.clear()
+            return
+        deadline = time.monotonic() + SYNC_INGEST_POLL_SECONDS
+        while self._running and time.monotonic() < deadline:
+            # Short reads so stop() is noticed; a burst of events is drained in one go
+            if self.inotify.read(timeout=1000):
+                self.inotify.read(timeout=200)
+                return
+    
+    def ingest(self):
+        """Ingest everything new in the sync folder; returns the number of records upserted"""
+        if self._progress is None:
+            self._progress = dict(self.db.query('SELECT source, position FROM sync_ingest_progress'))
+        if not os.path.isdir(self.folder):
+            return 0
+        
+        self._retry_missing_blobs()
+        count = 0
+        for entry in os.scandir(self.folder):
+            if not self._running:
+                break
+            if entry.name.endswith('_manifest.json'):
+                count += self._ingest_segments(entry.path)
+            elif entry.name.endswith('.json'):
+                count += self._ingest_legacy_file(entry)
+        count += self._flush()
+        return count
     
-    if new_scan.get('confidence', 0) - old_scan.get('confidence', 0) > 0.2:
-        changes.append(f"AI confidence increased by {(new_scan['confidence'] - old_scan['confidence'])*100:.0f}%")
+    def _ingest_segments(self, manifest_path):
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        device = manifest.get('device')
+        if not device or device == self.own_device:
+            return 0
+        source = f"segments:{device}"
+        position = self._progress.get(source, 0)
+        if manifest.get('next_offset', 0) <= position:
+            return 0
+        
+        count = 0
+        for segment in manifest.get('segments', []):
+            end = segment['offset'] + segment['bytes']
+            if end <= position:
+                continue
+            start = max(0, position - segment['offset'])
+            try:
+                with open(os.path.join(self.folder, segment['name']), 'rb') as f:
+                    f.seek(start)
+                    data = f.read(segment['bytes'] - start)
+            except OSError as e:
+                first_failed = self._unreadable_since.setdefault(segment['name'], time.monotonic())
+                if time.monotonic() - first_failed < SYNC_SEGMENT_SKIP_SECONDS:
+                    print(f"Sync segment {segment['name']} unreadable, retrying later: {e}")
+                    break
+                print(f"Sync segment {segment['name']} unreadable for too long, skipping it: {e}")
+                del self._unreadable_since[segment['name']]
+                position = end
+                self._pending_progress[source] = position
+                self._pending_progress[f"skipped:{device}:{segment['name']}"] = end
+                continue
+            self._unreadable_since.pop(segment['name'], None)
+            line_offset = segment['offset'] + start
+            for line in data.splitlines(keepends=True):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    self._pending.append(sync_record_row(record, f"{device}:{line_offset}", device))
+                    self._fetch_image(record)
+                line_offset += len(line)
+            position = end
+            self._pending_progress[source] = position
+            if len(self._pending) >= SYNC_INGEST_BATCH_SIZE:
+                count += self._flush()
+        return count
     
-    if new_scan.get('prediction', '') != old_scan.get('prediction', ''):
-        changes.append(f"Diagnosis changed from {old_scan.get('prediction', 'unknown')} to {new_scan.get('prediction', 'unknown')}")
+    def _fetch_image(self, record):
+        digest = record.get('image_sha256')
+        if not digest:
+            return
+        try:
+            copy_image_blob(digest, os.path.join(self.folder, "blobs"), IMAGE_BLOB_DIR)
+        except OSError as e:
+            print(f"Image blob {digest[:12]} not fetched, will retry: {e}")
+            # Saved with the record rows, so the retry list survives a restart
+            self._pending_missing[digest] = str(e)
     
-    risk_order = {'LOW': 0, 'MODERATE': 1, 'HIGH': 2, 'URGENT': 3}
-    old_risk = risk_order.get(old_scan.get('risk_level', 'LOW'), 0)
-    new_risk = risk_order.get(new_scan.get('risk_level', 'LOW'), 0)
+    def _retry_missing_blobs(self):
+        """Fetch blobs listed in missing_blobs; delete the rows that arrived"""
+        digests = [digest for (digest,) in self.db.query('SELECT digest FROM missing_blobs')]
+        if not digests:
+            return
+        fetched, failed = [], []
+        copied = 0
+        for digest in digests:
+            if not self._running:
+                break
+            try:
+                copied += copy_image_blob(digest, os.path.join(self.folder, "blobs"), IMAGE_BLOB_DIR)
+                fetched.append((digest,))
+            except OSError as e:
+                failed.append((str(e), digest))
+        if copied:
+            print(f"Fetched {copied} image blobs that were missing earlier")
+        
+        def job(cursor):
+            cursor.executemany('DELETE FROM missing_blobs WHERE digest = ?', fetched)
+            cursor.executemany('UPDATE missing_blobs SET attempts = attempts + 1, last_error = ? WHERE digest = ?', failed)
+        
+        self.writer.submit(job, tables=('missing_blobs',))
     
-    if new_risk > old_risk:
-        changes.append(f"Risk level increased from {old_scan.get('risk_level', 'LOW')} to {new_scan.get('risk_level', 'LOW')}")
+    def _ingest_legacy_file(self, entry):
+        source = f"file:{entry.name}"
+        try:
+            size = entry.stat().st_size
+        except OSError:
+            return 0
+        if self._progress.get(source) == size:
+            return 0
+        try:
+            with open(entry.path, 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            # Probably still being written; picked up on a later pass
+            return 0
+        if isinstance(record, dict) and record.get('source_device') != self.own_device:
+            self._pending.append(sync_record_row(record, entry.name[:-len('.json')]))
+        self._pending_progress[source] = size
+        if len(self._pending) >= SYNC_INGEST_BATCH_SIZE:
+            return self._flush()
+        return 0
     
-    return changes
-
-def sync_scan_to_shared_folder(scan_data):
-    """Save scan result to synced folder so other device can see it"""
-    try:
-        filename = os.path.join(SYNC_FOLDER, f"noma_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json")
+    def _flush(self):
+        rows, progress, missing = self._pending, self._pending_progress, self._pending_missing
+        self._pending, self._pending_progress, self._pending_missing = [], {}, {}
+        if not progress:
+            return 0
+        now = int(time.time())
         
-        scan_data['source_device'] = 'NOMA_AI'
-        scan_data['scan_type'] = 'skin'
-        scan_data['timestamp'] = datetime.now().isoformat()
+        def job(cursor):
+            cursor.executemany(self.UPSERT_SQL, rows)
+            cursor.executemany(self.PROGRESS_SQL, [(source, position, now) for source, position in progress.items()])
+            cursor.executemany(self.MISSING_BLOB_SQL, [(digest, now, error) for digest, error in missing.items()])
         
-        with open(filename, 'w') as f:
-            json.dump(scan_data, f, indent=2)
+        def on_saved(result, error):
+            if error is not None:
+                print(f"Sync ingest save error: {error}")
+                # Forget the unsaved progress so those records are read again
+                for source in progress:
+                    self._progress.pop(source, None)
         
-        print(f"Scan synced to shared folder: {filename}")
-        return True
-    except Exception as e:
-        print(f"Sync error: {e}")
-        return False
+        self.writer.submit(job, callback=on_saved, tables=('synced_records', 'missing_blobs'))
+        self._progress.update(progress)
+        return len(rows)
+
+sync_ingester = SyncIngester(tracking_db, db_writer, SYNC_FOLDER)
 
 # ---------------- Simple GPIO Controller ---------------- #
 class SimpleLED:
@@ -345,21 +2010,104 @@ def turn_off_leds():
     led_controller.all_off()
 
 # ---------------- Health Passport ---------------- #
+# Saves between compaction passes over the health passport
+PASSPORT_COMPACT_EVERY = 500
+
 class HealthPassport:
+    """Assessment history kept as append-only JSON lines (health_passport.jsonl).
+
+    Each save is one O_APPEND write of one line, so its cost does not depend on
+    the history length; a crash can at worst leave a torn last line, which readers
+    skip and the next start cuts off. While the file is in time order,
+    iter_assessments() seeks straight to the start of a date range. A save stamped
+    earlier than the last one (the clock went back, e.g. a Pi without an RTC before
+    NTP sync) creates an "unordered" marker file and triggers a compaction, which
+    sorts the file and removes the marker; until then readers scan linearly.
+    """
+    
     def __init__(self):
         self.history_dir = os.path.join(HOME_DIR, "noma_ai")
-        self.history_file = os.path.join(self.history_dir, "health_passport.json")
+        self.history_file = os.path.join(self.history_dir, "health_passport.jsonl")
+        self.legacy_file = os.path.join(self.history_dir, "health_passport.json")
+        self.unordered_marker = self.history_file + ".unordered"
+        self._lock = threading.Lock()
+        self._saves_since_compaction = 0
         self._ensure_dir()
-        self._ensure_file()
+        self._migrate_legacy_file()
+        self._repair_tail()
+        self._last_timestamp = self._read_last_timestamp()
+        self._in_order = not os.path.exists(self.unordered_marker)
+        if not self._in_order:
+            # A crash came between an out-of-order append and its compaction
+            self.compact()
 
     def _ensure_dir(self):
         if not os.path.exists(self.history_dir):
             os.makedirs(self.history_dir)
 
-    def _ensure_file(self):
-        if not os.path.exists(self.history_file):
-            with open(self.history_file, 'w') as f:
-                json.dump([], f)
+    def _migrate_legacy_file(self):
+        """Convert the old single-array health_passport.json to JSON lines, once"""
+        if not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, 'r') as f:
+                history = json.load(f)
+            tmp_path = self.history_file + '.tmp'
+            with open(tmp_path, 'w') as out:
+                for record in history:
+                    out.write(json.dumps(record, separators=(',', ':'), default=json_default) + '\n')
+                if os.path.exists(self.history_file):
+                    with open(self.history_file, 'r') as current:
+                        shutil.copyfileobj(current, out)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, self.history_file)
+            os.replace(self.legacy_file, self.legacy_file + '.migrated')
+            print(f"Migrated {len(history)} assessments to {self.history_file}")
+        except (OSError, ValueError) as e:
+            print(f"Health passport migration failed: {e}")
+
+    def _repair_tail(self):
+        """Cut off a torn final line left by a crash mid-append"""
+        try:
+            with open(self.history_file, 'rb+') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size == 0:
+                    return
+                f.seek(size - 1)
+                if f.read(1) == b'\n':
+                    return
+                # Walk back to the last complete line
+                block = 4096
+                end = size
+                while end > 0:
+                    start = max(0, end - block)
+                    f.seek(start)
+                    newline = f.read(end - start).rfind(b'\n')
+                    if newline >= 0:
+                        f.truncate(start + newline + 1)
+                        return
+                    end = start
+                f.truncate(0)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Health passport repair failed: {e}")
+
+    def _read_last_timestamp(self):
+        """Timestamp of the last complete record, read from the end of the file"""
+        try:
+            with open(self.history_file, 'rb') as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - 8192))
+                tail = f.read()
+        except OSError:
+            return ''
+        for line in reversed(tail.splitlines()):
+            record = self._parse_line(line)
+            if record is not None:
+                return record.get('timestamp') or ''
+        return ''
 
     def save_assessment(self, results, image_path=None):
         record = {
@@ -375,18 +2123,200 @@ class HealthPassport:
             'skin_tone': results.get('skin_tone', 'Unknown')
         }
         try:
-            with open(self.history_file, 'r') as f:
-                history = json.load(f)
-            history.append(record)
-            with open(self.history_file, 'w') as f:
-                json.dump(history, f, indent=2)
+            line = (json.dumps(record, separators=(',', ':'), default=json_default) + '\n').encode('utf-8')
+            with self._lock:
+                out_of_order = record['timestamp'] < self._last_timestamp
+                if out_of_order:
+                    # Marker first, so a crash before compaction still disables seeking
+                    open(self.unordered_marker, 'w').close()
+                    self._in_order = False
+                fd = os.open(self.history_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                self._last_timestamp = max(self._last_timestamp, record['timestamp'])
+                self._saves_since_compaction += 1
+                compact = out_of_order or self._saves_since_compaction >= PASSPORT_COMPACT_EVERY
             print("Assessment saved to health passport")
+            if compact:
+                self.compact()
         except Exception as e:
             print(f"Failed to save health passport: {e}")
 
+    def compact(self):
+        """Rewrite the passport without damaged lines and in time order, if it needs it.
+
+        A clean file is only read, never rewritten; otherwise the new file replaces
+        the old one with an atomic rename.
+        """
+        with self._lock:
+            self._saves_since_compaction = 0
+            records = []
+            needs_rewrite = False
+            last_timestamp = ''
+            try:
+                with open(self.history_file, 'rb') as f:
+                    for line in f:
+                        record = self._parse_line(line)
+                        if record is None:
+                            needs_rewrite = True
+                            continue
+                        timestamp = record.get('timestamp') or ''
+                        if timestamp < last_timestamp:
+                            needs_rewrite = True
+                        last_timestamp = max(last_timestamp, timestamp)
+                        records.append((timestamp, line if line.endswith(b'\n') else line + b'\n'))
+            except FileNotFoundError:
+                records = []
+            if needs_rewrite:
+                records.sort(key=lambda item: item[0])
+                tmp_path = self.history_file + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.writelines(line for _, line in records)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.history_file)
+                print(f"Health passport compacted to {len(records)} assessments")
+            self._last_timestamp = last_timestamp
+            if not self._in_order:
+                try:
+                    os.remove(self.unordered_marker)
+                except FileNotFoundError:
+                    pass
+                self._in_order = True
+
+    @staticmethod
+    def _parse_line(line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) else None
+
+    def _seek_offset(self, f, size, start):
+        """Byte offset at or before the first line timestamped >= start (binary search)"""
+        lo, hi = 0, size
+        while hi - lo > 4096:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()
+            record = self._parse_line(f.readline())
+            if record is not None and (record.get('timestamp') or '') < start:
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def iter_assessments(self, start=None, end=None, prediction=None):
+        """Yield assessments in time order, optionally within [start, end) and for one prediction.
+
+        start and end are datetimes or ISO strings. Lines are read one at a time;
+        while the file is in time order only those from the start of the range on
+        are read, otherwise the whole file is scanned in file order.
+        """
+        if isinstance(start, datetime):
+            start = start.isoformat()
+        if isinstance(end, datetime):
+            end = end.isoformat()
+        try:
+            f = open(self.history_file, 'rb')
+        except FileNotFoundError:
+            return
+        in_order = self._in_order
+        with f:
+            if start and in_order:
+                size = f.seek(0, os.SEEK_END)
+                offset = self._seek_offset(f, size, start)
+                f.seek(offset)
+                if offset:
+                    f.readline()
+            for line in f:
+                record = self._parse_line(line)
+                if record is None:
+                    continue
+                timestamp = record.get('timestamp') or ''
+                if start and timestamp < start:
+                    continue
+                if end and timestamp >= end:
+                    if in_order:
+                        break
+                    continue
+                if prediction is not None and record.get('ai_prediction') != prediction:
+                    continue
+                yield record
+
 health_passport = HealthPassport()
 
 # ---------------- ITA-based Preprocessing and Grad-CAM ---------------- #
+# ITA reads every ITA_SAMPLE_STRIDE-th pixel in each direction
+ITA_SAMPLE_STRIDE = 4
+# L* outside this range is shadow or specular glare, not skin
+ITA_SKIN_L_RANGE = (5.0, 98.0)
+# A dark region is taken as the lesion when it covers this fraction of the sample
+ITA_LESION_AREA_RANGE = (0.005, 0.5)
+# ...and only when it is clearly darker than the rest of the skin: Otsu also splits a
+# lesion-free frame, along its shading or vignetting. The mean L* gap must be at least
+# this fraction of the skin's L* + 16, which a lighting gain scales alike on every
+# skin tone (L* + 16 goes with the cube root of luminance); 0.25 tolerates ~35% falloff
+ITA_LESION_MIN_CONTRAST = 0.25
+# Below this fraction of skin pixels the whole sample is used instead
+ITA_MIN_SKIN_FRACTION = 0.05
+
+# sRGB uint8 -> linear light, and the D65 rows of the linear RGB -> XYZ matrix for Y and Z/Zn
+_SRGB_LINEAR = np.where(np.arange(256) / 255.0 <= 0.04045, np.arange(256) / 255.0 / 12.92,
+                        ((np.arange(256) / 255.0 + 0.055) / 1.055) ** 2.4).astype(np.float32)
+_XYZ_Y = np.array([0.2126729, 0.7151522, 0.0721750], dtype=np.float32)
+_XYZ_Z = np.array([0.0193339, 0.1191920, 0.9503041], dtype=np.float32) / np.float32(1.08883)
+
+def _lab_f(t):
+    return np.where(t > (6 / 29) ** 3, np.cbrt(t), t / (3 * (6 / 29) ** 2) + 4 / 29)
+
+def lab_lightness_yellowness(rgb):
+    """CIE L* (0-100) and b* of an (N, 3) RGB array; uint8 goes through the linearisation LUT"""
+    if rgb.dtype == np.uint8:
+        linear = _SRGB_LINEAR[rgb]
+        f_y = _lab_f(linear @ _XYZ_Y)
+        f_z = _lab_f(linear @ _XYZ_Z)
+        return 116 * f_y - 16, 200 * (f_y - f_z)
+    lab = cv2.cvtColor(np.ascontiguousarray(rgb, dtype=np.float32)[None], cv2.COLOR_RGB2LAB)[0]
+    return lab[:, 0], lab[:, 2]
+
+def skin_sample_mask(L):
+    """Skin pixels of an L* image: drops glare, shadow and the largest clearly darker (lesion) region"""
+    mask = (L > ITA_SKIN_L_RANGE[0]) & (L < ITA_SKIN_L_RANGE[1])
+    gray = cv2.GaussianBlur(np.clip(L * 2.55, 0, 255).astype(np.uint8), (5, 5), 0)
+    _, dark = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(dark, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if contours:
+        lesion = max(contours, key=cv2.contourArea)
+        area_fraction = cv2.contourArea(lesion) / L.size
+        if ITA_LESION_AREA_RANGE[0] <= area_fraction <= ITA_LESION_AREA_RANGE[1]:
+            lesion_mask = np.zeros(L.shape, dtype=np.uint8)
+            cv2.drawContours(lesion_mask, [lesion], -1, 255, -1)
+            inside = mask & (lesion_mask > 0)
+            # Margin so the lesion's halo does not count as skin
+            outside = mask & (cv2.dilate(lesion_mask, np.ones((5, 5), np.uint8)) == 0)
+            if inside.any() and outside.any():
+                skin_l = L[outside].mean()
+                if skin_l - L[inside].mean() >= ITA_LESION_MIN_CONTRAST * (skin_l + 16.0):
+                    mask = outside
+    return mask
+
+_clahe_local = threading.local()
+
+def cached_clahe(clip_limit, tile_grid_size=(8, 8)):
+    """CLAHE object per (clip limit, grid), kept per thread since apply() is not thread-safe"""
+    cache = getattr(_clahe_local, 'by_params', None)
+    if cache is None:
+        cache = _clahe_local.by_params = {}
+    key = (clip_limit, tile_grid_size)
+    clahe = cache.get(key)
+    if clahe is None:
+        clahe = cache[key] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
+    return clahe
+
 class ITAPreprocessor:
     """Handles ITA-based skin tone detection and adaptive preprocessing"""
     
@@ -396,16 +2326,23 @@ class ITAPreprocessor:
         Calculate Individual Typology Angle for skin tone estimation
         ITA = arctan((L* - 50) / b*) in degrees
         Higher ITA = lighter skin, Lower ITA = darker skin
+        
+        Averaged over a strided sample of skin pixels, with the lesion masked out
         """
         try:
-            # Convert to LAB color space
-            lab = cv2.cvtColor(image_array, cv2.COLOR_RGB2LAB)
-            L = lab[:, :, 0].astype(np.float32)
-            b = lab[:, :, 2].astype(np.float32)
+            # Convert the sampled pixels to L*, b*
+            sample = image_array[::ITA_SAMPLE_STRIDE, ::ITA_SAMPLE_STRIDE, :3]
+            L, b = lab_lightness_yellowness(sample.reshape(-1, 3))
+            L = L.reshape(sample.shape[:2])
+            b = b.reshape(sample.shape[:2])
+            
+            skin = skin_sample_mask(L)
+            if np.count_nonzero(skin) < ITA_MIN_SKIN_FRACTION * skin.size:
+                skin = np.ones(L.shape, dtype=bool)
             
             # ITA formula: arctan((L* - 50) / b*) in degrees
-            mean_L = np.mean(L) * (100.0 / 255.0)
-            mean_b = np.mean(b) - 128.0
+            mean_L = float(np.mean(L[skin]))
+            mean_b = float(np.mean(b[skin]))
             
             # Avoid division by zero
             if abs(mean_b) < 0.01:
@@ -454,7 +2391,7 @@ class ITAPreprocessor:
         lab = cv2.cvtColor(image_array, cv2.COLOR_RGB2LAB)
         L = lab[:, :, 0].astype(np.uint8)
         
-        clahe = cv2.createCLAHE(clipLimit=boost_factor, tileGridSize=(8, 8))
+        clahe = cached_clahe(boost_factor)
         enhanced_L = clahe.apply(L)
         
         lab[:, :, 0] = enhanced_L
@@ -463,6 +2400,120 @@ class ITAPreprocessor:
         return enhanced
 
 
+# Output tensors of the classifier, told apart by rank. The CAM export
+# (noma_ai_training.py) adds the last conv feature map and, per class, the
+# channel weights of the head's Jacobian; the plain model only has probabilities.
+TFLITE_OUTPUT_RANKS = {2: 'probabilities', 3: 'cam_weights', 4: 'feature_map'}
+
+def tflite_output_roles(output_details):
+    """Map 'probabilities' / 'feature_map' / 'cam_weights' to output detail dicts"""
+    roles = {}
+    for detail in output_details:
+        role = TFLITE_OUTPUT_RANKS.get(len(detail['shape']))
+        if role and role not in roles:
+            roles[role] = detail
+    if 'probabilities' not in roles:
+        roles['probabilities'] = output_details[0]
+    return roles
+
+def dequantize_output(interpreter, detail):
+    """Output tensor as float32, undoing (scale, zero_point) for integer outputs"""
+    values = interpreter.get_tensor(detail['index'])
+    if not np.issubdtype(values.dtype, np.integer):
+        return values.astype(np.float32)
+    scale, zero_point = detail.get('quantization', (0.0, 0))
+    if not scale:
+        return values.astype(np.float32)
+    return (values.astype(np.float32) - zero_point) * scale
+
+# Size of the heatmap labels; render() computes heatmaps directly at this resolution
+HEATMAP_DISPLAY_SIZE = (300, 250)
+
+class HeatmapEngine:
+    """Vectorised lesion-centred attention heatmaps.
+
+    The Gaussian falloff is separable, so the map is the outer product of a column
+    and a row profile: h + w exponentials instead of h * w.
+    """
+    
+    @staticmethod
+    def gaussian(shape, center, sigma):
+        """float32 map of exp(-dist^2 / 2 sigma^2) from center (row, col) over shape"""
+        h, w = shape
+        cy, cx = center
+        profiles = []
+        for length, c in ((h, cy), (w, cx)):
+            d = np.arange(length, dtype=np.float32) - np.float32(c)
+            profiles.append(np.exp(d * d * np.float32(-0.5 / (sigma * sigma))))
+        return np.outer(profiles[0], profiles[1])
+    
+    @staticmethod
+    def attention_map(mask, bbox, confidence):
+        """Gaussian centred on the lesion bbox, cut to the lesion mask and sharpened by confidence"""
+        h_img, w_img = mask.shape[:2]
+        x, y, w, h = bbox
+        max_dist = max(h, w) / 2 if max(h, w) > 0 else 1
+        heatmap = HeatmapEngine.gaussian((h_img, w_img), (y + h // 2, x + w // 2), max_dist / 2)
+        heatmap *= (mask > 0)
+        peak = np.max(heatmap)
+        if peak > 0:
+            heatmap /= peak
+        return np.power(heatmap, 1.5 - confidence * 0.5)
+    
+    @staticmethod
+    def display_shape(image_shape, display_size=HEATMAP_DISPLAY_SIZE):
+        """(width, height) that fits display_size with the image's aspect ratio, never upscaling"""
+        h, w = image_shape[:2]
+        scale = min(display_size[0] / w, display_size[1] / h, 1.0)
+        return max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+    
+    @staticmethod
+    def render(image_array, predicted_class, confidence, overlay_image=None,
+               display_size=HEATMAP_DISPLAY_SIZE, alpha=0.5):
+        """Heatmap overlay computed at display resolution; returns (blended, heatmap).
+
+        The frame is downscaled first, so contour detection, the Gaussian and the
+        blend all run on the small image. overlay_image (default image_array) is the
+        picture the heatmap is drawn over.
+        """
+        prepared = HeatmapEngine.prepare(image_array, overlay_image, display_size)
+        return HeatmapEngine.render_prepared(prepared, predicted_class, confidence, alpha=alpha)
+    
+    @staticmethod
+    def prepare(image_array, overlay_image=None, display_size=HEATMAP_DISPLAY_SIZE):
+        """The prediction-independent part of render(): (base, small frame, lesion contour)"""
+        size = HeatmapEngine.display_shape(image_array.shape, display_size)
+        small = cv2.resize(image_array, size, interpolation=cv2.INTER_AREA)
+        if overlay_image is None:
+            base = small
+        else:
+            base = cv2.resize(overlay_image, size, interpolation=cv2.INTER_AREA)
+        return base, small, GradCAMVisualizer.detect_lesion_contour(small)
+    
+    @staticmethod
+    def render_prepared(prepared, predicted_class, confidence, alpha=0.5):
+        """Finish render() from prepare()'s output once the prediction is known"""
+        base, small, lesion = prepared
+        heatmap, _ = GradCAMVisualizer.generate_heatmap(small, predicted_class, confidence, lesion=lesion)
+        return GradCAMVisualizer.overlay_heatmap(base, heatmap, alpha=alpha), heatmap
+    
+    @staticmethod
+    def class_activation_map(feature_map, channel_weights):
+        """relu(sum_k w_k * A_k) over an (H, W, C) feature map, normalised to [0, 1]"""
+        cam = np.maximum(feature_map @ channel_weights, 0).astype(np.float32)
+        peak = cam.max()
+        if peak > 0:
+            cam /= peak
+        return cam
+    
+    @staticmethod
+    def render_cam(cam, overlay_image, display_size=HEATMAP_DISPLAY_SIZE, alpha=0.5):
+        """Upsample a model CAM to display resolution and blend it; returns (blended, heatmap)"""
+        size = HeatmapEngine.display_shape(overlay_image.shape, display_size)
+        base = cv2.resize(overlay_image, size, interpolation=cv2.INTER_AREA)
+        heatmap = np.clip(cv2.resize(cam, size, interpolation=cv2.INTER_CUBIC), 0, 1)
+        return GradCAMVisualizer.overlay_heatmap(base, heatmap, alpha=alpha), heatmap
+
 class GradCAMVisualizer:
     """Creates a heatmap around the detected lesion area using contour detection."""
     
@@ -499,39 +2550,20 @@ class GradCAMVisualizer:
             return mask, (w//4, h//4, w//2, h//2), (w*h)//4
     
     @staticmethod
-    def generate_heatmap(image_array, predicted_class, confidence):
-        """Generate Grad-CAM style heatmap focused on the detected lesion area."""
+    def generate_heatmap(image_array, predicted_class, confidence, lesion=None):
+        """Generate Grad-CAM style heatmap focused on the detected lesion area.
+
+        lesion is detect_lesion_contour(image_array), if already computed.
+        """
         try:
-            mask, bbox, area = GradCAMVisualizer.detect_lesion_contour(image_array)
-            x, y, w, h = bbox
-            
-            h_img, w_img = image_array.shape[:2]
-            heatmap = np.zeros((h_img, w_img), dtype=np.float32)
-            center_x = x + w // 2
-            center_y = y + h // 2
-            
-            for i in range(h_img):
-                for j in range(w_img):
-                    dist = np.sqrt((i - center_y)**2 + (j - center_x)**2)
-                    max_dist = max(h, w) / 2 if max(h, w) > 0 else 1
-                    heatmap[i, j] = np.exp(-(dist**2) / (2 * (max_dist/2)**2))
-            
-            heatmap = heatmap * (mask > 0).astype(np.float32)
-            if np.max(heatmap) > 0:
-                heatmap = heatmap / np.max(heatmap)
-            heatmap = np.power(heatmap, 1.5 - confidence * 0.5)
-            return heatmap, bbox
+            mask, bbox, area = lesion or GradCAMVisualizer.detect_lesion_contour(image_array)
+            return HeatmapEngine.attention_map(mask, bbox, confidence), bbox
             
         except Exception as e:
             print(f"Heatmap generation error: {e}")
             h, w = image_array.shape[:2]
-            heatmap = np.zeros((h, w), dtype=np.float32)
-            center_y, center_x = h // 2, w // 2
-            for i in range(h):
-                for j in range(w):
-                    dist = np.sqrt((i - center_y)**2 + (j - center_x)**2)
-                    max_dist = max(h, w) / 2 if max(h, w) > 0 else 1
-                    heatmap[i, j] = np.exp(-(dist**2) / (2 * (max_dist/2)**2))
+            max_dist = max(h, w) / 2 if max(h, w) > 0 else 1
+            heatmap = HeatmapEngine.gaussian((h, w), (h // 2, w // 2), max_dist / 2)
             return heatmap, (w//4, h//4, w//2, h//2)
     
     @staticmethod
@@ -547,30 +2579,254 @@ class GradCAMVisualizer:
         blended = cv2.addWeighted(original_image, 1 - alpha, heatmap_colored, alpha, 0)
         return blended
 
+# ---------------- RENDITION STORE ---------------- #
+# Display-sized thumbnails and heatmap overlays of tracked photos, for the past-scans viewer
+RENDITION_DIR = os.path.join(TRACKED_IMAGES_DIR, "renditions")
+
+def rendition_key(image_path):
+    """Blob digest for content-addressed photos, else a hash of path, size and mtime"""
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    if len(stem) == 64 and all(c in '0123456789abcdef' for c in stem):
+        return stem
+    stat = os.stat(image_path)
+    return hashlib.sha256(f"{os.path.abspath(image_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+def load_display_image(image_path, display_size=HEATMAP_DISPLAY_SIZE):
+    """RGB array fitted to display_size, decoded at reduced resolution where the format allows"""
+    with Image.open(image_path) as img:
+        size = HeatmapEngine.display_shape((img.height, img.width), display_size)
+        # JPEG: DCT scaling to the smallest 1/2, 1/4 or 1/8 that still covers size
+        img.draft('RGB', size)
+        pixels = np.asarray(img.convert('RGB'))
+    if (pixels.shape[1], pixels.shape[0]) == size:
+        return pixels
+    return cv2.resize(pixels, size, interpolation=cv2.INTER_AREA)
+
+class RenditionStore:
+    """Thumbnail and overlay JPEGs at display size, one pair per tracked photo.
+
+    put() queues both at track time from the frame in memory, with the overlay
+    that was shown at analysis. get() returns the stored pair, rendering any
+    missing one once from a reduced-resolution decode of the photo.
+    """
+    
+    def __init__(self, root=RENDITION_DIR, display_size=HEATMAP_DISPLAY_SIZE, quality=IMAGE_JPEG_QUALITY):
+        self.root = root
+        self.display_size = display_size
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="renditions")
+    
+    def paths(self, key):
+        """(thumbnail, overlay) paths, sharded like the blob store"""
+        folder = os.path.join(self.root, key[:2])
+        return os.path.join(folder, f"{key}_thumb.jpg"), os.path.join(folder, f"{key}_overlay.jpg")
+    
+    def put(self, key, image_array, overlay=None):
+        """Queue renditions of a frame being tracked; without overlay, get() renders it later"""
+        size = HeatmapEngine.display_shape(image_array.shape, self.display_size)
+        thumb = cv2.resize(image_array, size, interpolation=cv2.INTER_AREA)
+        if overlay is not None and (overlay.shape[1], overlay.shape[0]) != size:
+            overlay = cv2.resize(overlay, size, interpolation=cv2.INTER_AREA)
+        thumb_path, overlay_path = self.paths(key)
+        future = self._executor.submit(self._write_pair, thumb, thumb_path, overlay, overlay_path)
+        future.add_done_callback(self._finished)
+    
+    def _write_pair(self, thumb, thumb_path, overlay, overlay_path):
+        self._write(thumb, thumb_path)
+        if overlay is not None:
+            self._write(overlay, overlay_path)
+    
+    def _write(self, pixels, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        Image.fromarray(pixels).save(tmp_path, format='JPEG', quality=self.quality)
+        os.replace(tmp_path, path)
+    
+    def _finished(self, future):
+        if future.exception() is not None:
+            print(f"Rendition write error: {future.exception()}")
+    
+    def get(self, image_path, prediction, confidence):
+        """(thumbnail_path, overlay_path) for a tracked photo, rendering whichever is missing"""
+        thumb_path, overlay_path = self.paths(rendition_key(image_path))
+        have_thumb, have_overlay = os.path.exists(thumb_path), os.path.exists(overlay_path)
+        if not (have_thumb and have_overlay):
+            small = load_display_image(image_path, self.display_size)
+            if not have_thumb:
+                self._write(small, thumb_path)
+            if not have_overlay:
+                blended, _ = HeatmapEngine.render(small, prediction, confidence, display_size=self.display_size)
+                self._write(blended, overlay_path)
+        return thumb_path, overlay_path
+    
+    def shutdown(self):
+        """Finish every queued write"""
+        self._executor.shutdown(wait=True)
+
+renditions = RenditionStore()
+
 # ---------------- Clinical Feature Extractor ---------------- #
 class ClinicalFeatureExtractor:
+    """ABCD features of a single image; FramePipeline shares the work across all four."""
+    
     @staticmethod
     def calculate_asymmetry(image):
+        return FramePipeline(image).asymmetry_score()[0]
+
+    @staticmethod
+    def calculate_asymmetry_score(image):
+        return FramePipeline(image).asymmetry_score()
+
+    @staticmethod
+    def calculate_border_irregularity(image):
+        return FramePipeline(image).border_score()[0]
+
+    @staticmethod
+    def calculate_border_score(image):
+        return FramePipeline(image).border_score()
+
+    @staticmethod
+    def calculate_color_uniformity(image):
         try:
-            img = np.array(image.convert('L'))
-            h, w = img.shape
-            left = img[:, :w//2]
-            right = img[:, w//2:]
-            right_flipped = np.fliplr(right)
-            min_h = min(left.shape[0], right_flipped.shape[0])
-            min_w = min(left.shape[1], right_flipped.shape[1])
-            left = left[:min_h, :min_w]
-            right_flipped = right_flipped[:min_h, :min_w]
-            diff = np.mean(np.abs(left - right_flipped))
-            return min(diff / 50.0, 1.0)
+            hsv = FramePipeline(image).hsv()
+            std_h = np.std(hsv[:, :, 0])
+            std_s = np.std(hsv[:, :, 1])
+            std_v = np.std(hsv[:, :, 2])
+            total_std = (std_h + std_s + std_v) / 3
+            return min(total_std / 50.0, 1.0)
         except Exception as e:
-            print(f"Asymmetry calculation error: {e}")
+            print(f"Color uniformity calculation error: {e}")
             return 0.5
 
     @staticmethod
-    def calculate_asymmetry_score(image):
+    def analyze_color_distribution(image):
+        return FramePipeline(image).color_distribution()
+
+    @staticmethod
+    def estimate_diameter(image, reference_mm=10):
+        return FramePipeline(image).diameter_mm()
+
+    @staticmethod
+    def generate_clinical_report(features):
+        report = []
+        
+        asymmetry_score, asymmetry_exp = features.get('asymmetry', (0.5, ""))
+        border_score, border_exp = features.get('border', (0.5, ""))
+        color_score, color_exp, color_count = features.get('color', (0.5, "", 1))
+        diameter_mm = features.get('diameter_mm', 0)
+        
+        report.append("=== CLINICAL FEATURE ANALYSIS ===\n")
+        
+        if asymmetry_score > 0.6:
+            report.append(f"ASYMMETRY: {asymmetry_exp}")
+        else:
+            report.append(f"SYMMETRY: {asymmetry_exp}")
+        
+        if border_score > 0.6:
+            report.append(f"BORDER: {border_exp}")
+        else:
+            report.append(f"BORDER: {border_exp}")
+        
+        if color_score > 0.5:
+            report.append(f"COLOR: {color_exp}")
+        else:
+            report.append(f"COLOR: {color_exp}")
+        
+        if diameter_mm > 6:
+            report.append(f"DIAMETER: {diameter_mm:.1f}mm (>6mm threshold)")
+        elif diameter_mm > 0:
+            report.append(f"DIAMETER: {diameter_mm:.1f}mm (within normal range)")
+        else:
+            report.append("DIAMETER: Could not measure accurately")
+        
+        risk_factors = sum([
+            asymmetry_score > 0.5,
+            border_score > 0.5,
+            color_score > 0.4,
+            diameter_mm > 6
+        ])
+        
+        report.append("\n=== SUMMARY ===\n")
+        if risk_factors >= 3:
+            report.append("HIGH RISK: Multiple concerning features detected")
+        elif risk_factors >= 2:
+            report.append("MODERATE RISK: Some concerning features present")
+        elif risk_factors >= 1:
+            report.append("LOW RISK: Minor features detected, monitor for changes")
+        else:
+            report.append("VERY LOW RISK: No concerning features detected")
+        
+        return "\n".join(report)
+
+
+# ---------------- FRAME PIPELINE ---------------- #
+class FramePipeline:
+    """ABCD features of one frame, computed from shared intermediates.
+
+    Grayscale, HSV, the 127-threshold mask and its largest contour are computed
+    on first use and then reused by every metric. timings maps each stage to
+    the milliseconds spent in it.
+    """
+    
+    def __init__(self, image):
+        """image: PIL image or RGB uint8 array"""
+        if isinstance(image, Image.Image):
+            self.image = image
+            self.rgb = np.array(image)
+        else:
+            self.rgb = image
+            self.image = Image.fromarray(image)
+        self.timings = {}
+        self._stages = {}
+    
+    def timed(self, stage, compute, *args, **kwargs):
+        """Run compute, adding its wall time to timings[stage]"""
+        start = time.perf_counter()
+        try:
+            return compute(*args, **kwargs)
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+    
+    def _shared(self, stage, compute):
+        if stage not in self._stages:
+            self._stages[stage] = self.timed(stage, compute)
+        return self._stages[stage]
+    
+    def gray(self):
+        # PIL's luma weights, not cv2's; the scores were tuned on these values
+        return self._shared('gray', lambda: np.array(self.image.convert('L')))
+    
+    def hsv(self):
+        return self._shared('hsv', lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2HSV))
+    
+    def hue(self):
+        return self._shared('hue', lambda: cv2.extractChannel(self.hsv(), 0))
+    
+    def hue_histogram(self):
+        """np.histogram(hue, bins=10) counts, binned from the 256-level histogram instead of per pixel"""
+        def compute():
+            hue = self.hue()
+            if hue.size >= 1 << 24:     # calcHist counts in float32
+                return np.histogram(hue, bins=10)[0]
+            counts = cv2.calcHist([hue], [0], None, [256], [0, 256]).ravel()
+            levels = np.flatnonzero(counts)
+            return np.histogram(levels, bins=10, range=(levels[0], levels[-1]),
+                                weights=counts[levels])[0].astype(np.int64)
+        return self._shared('hue_hist', compute)
+    
+    def threshold_mask(self):
+        return self._shared('mask', lambda: cv2.threshold(self.gray(), 127, 255, cv2.THRESH_BINARY)[1])
+    
+    def largest_contour(self):
+        """Largest external contour of threshold_mask(), or None"""
+        def compute():
+            contours, _ = cv2.findContours(self.threshold_mask(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            return max(contours, key=cv2.contourArea) if contours else None
+        return self._shared('contour', compute)
+    
+    def asymmetry_score(self):
         try:
-            img = np.array(image.convert('L'))
+            img = self.gray()
             h, w = img.shape
             left = img[:, :w//2]
             right = img[:, w//2:]
@@ -579,6 +2835,7 @@ class ClinicalFeatureExtractor:
             min_w = min(left.shape[1], right_flipped.shape[1])
             left = left[:min_h, :min_w]
             right_flipped = right_flipped[:min_h, :min_w]
+            # uint8 subtraction wraps around; kept as is so scores match earlier scans
             diff = np.mean(np.abs(left - right_flipped))
             score = min(diff / 50.0, 1.0)
             
@@ -592,38 +2849,13 @@ class ClinicalFeatureExtractor:
             return score, explanation
         except Exception as e:
             return 0.5, "Could not calculate asymmetry"
-
-    @staticmethod
-    def calculate_border_irregularity(image):
-        try:
-            img = np.array(image.convert('L'))
-            _, binary = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            if not contours:
-                return 0.5
-            contour = max(contours, key=cv2.contourArea)
-            perimeter = cv2.arcLength(contour, True)
-            area = cv2.contourArea(contour)
-            if area == 0:
-                return 0.5
-            circularity = 4 * np.pi * area / (perimeter * perimeter)
-            irregularity = max(0, min(1, 1 - circularity))
-            return irregularity
-        except Exception as e:
-            print(f"Border irregularity calculation error: {e}")
-            return 0.5
-
-    @staticmethod
-    def calculate_border_score(image):
+    
+    def border_score(self):
         try:
-            img = np.array(image.convert('L'))
-            _, binary = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if not contours:
+            contour = self.largest_contour()
+            if contour is None:
                 return 0.5, "Could not detect lesion border"
             
-            contour = max(contours, key=cv2.contourArea)
             perimeter = cv2.arcLength(contour, True)
             area = cv2.contourArea(contour)
             
@@ -643,33 +2875,12 @@ class ClinicalFeatureExtractor:
             return irregularity, explanation
         except Exception as e:
             return 0.5, "Could not calculate border irregularity"
-
-    @staticmethod
-    def calculate_color_uniformity(image):
-        try:
-            img = np.array(image)
-            hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
-            std_h = np.std(hsv[:, :, 0])
-            std_s = np.std(hsv[:, :, 1])
-            std_v = np.std(hsv[:, :, 2])
-            total_std = (std_h + std_s + std_v) / 3
-            return min(total_std / 50.0, 1.0)
-        except Exception as e:
-            print(f"Color uniformity calculation error: {e}")
-            return 0.5
-
-    @staticmethod
-    def analyze_color_distribution(image):
+    
+    def color_distribution(self):
         try:
-            img = np.array(image)
-            hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
-            
-            mean_h = np.mean(hsv[:, :, 0])
-            std_h = np.std(hsv[:, :, 0])
-            mean_s = np.mean(hsv[:, :, 1])
-            std_s = np.std(hsv[:, :, 1])
+            std_h = np.std(self.hue())
             
-            h_bins = np.histogram(hsv[:, :, 0], bins=10)[0]
+            h_bins = self.hue_histogram()
             distinct_estimate = np.sum(h_bins > (np.max(h_bins) * 0.1))
             
             color_score = min(std_h / 50.0, 1.0)
@@ -684,75 +2895,95 @@ class ClinicalFeatureExtractor:
             return color_score, explanation, distinct_estimate
         except Exception as e:
             return 0.5, "Could not analyze color", 1
-
-    @staticmethod
-    def estimate_diameter(image, reference_mm=10):
+    
+    def diameter_mm(self):
         try:
-            img = np.array(image.convert('L'))
-            _, binary = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            if not contours:
+            contour = self.largest_contour()
+            if contour is None:
                 return 0
-            contour = max(contours, key=cv2.contourArea)
             x, y, w, h = cv2.boundingRect(contour)
             pixels_per_mm = 6.4
-            diameter_mm = max(w, h) / pixels_per_mm
-            return diameter_mm
+            return max(w, h) / pixels_per_mm
         except Exception as e:
             print(f"Diameter estimation error: {e}")
             return 0
+    
+    def analyze(self):
+        """All four ABCD features, in the layout generate_clinical_report takes"""
+        # Build the shared stages up front so each metric's timing is its own work;
+        # a stage that fails is reported by the metric that needs it
+        for stage in (self.gray, self.hue_histogram, self.largest_contour):
+            try:
+                stage()
+            except Exception:
+                pass
+        return {
+            'asymmetry': self.timed('asymmetry', self.asymmetry_score),
+            'border': self.timed('border', self.border_score),
+            'color': self.timed('color', self.color_distribution),
+            'diameter_mm': self.timed('diameter', self.diameter_mm),
+        }
+    
+    def timing_report(self):
+        stages = ", ".join(f"{stage} {ms:.1f}" for stage, ms in self.timings.items())
+        return f"{stages} (total {sum(self.timings.values()):.1f} ms)"
+
+
+# ---------------- ANALYSIS ORCHESTRATOR ---------------- #
+class AnalysisOrchestrator:
+    """Runs the analysis stages of one scan on a small thread pool.
+
+    ITA and the contrast boost run first because every later stage reads the
+    enhanced frame. Model inference, the ABCD features and (when the model has
+    no CAM output) heatmap preparation then run concurrently. TFLite and OpenCV
+    release the GIL, so a scan takes about as long as its slowest stage.
+    """
+    
+    def __init__(self, max_workers=3):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+    
+    @staticmethod
+    def _timed(timings, stage, compute, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return compute(*args, **kwargs)
+        finally:
+            timings[stage] = (time.perf_counter() - start) * 1000
+    
+    def run(self, frame, infer, prepare_heatmap=True):
+        """Analyse an RGB frame; infer(pipeline) runs the model and comes back as 'inference'.
 
-    @staticmethod
-    def generate_clinical_report(features):
-        report = []
-        
-        asymmetry_score, asymmetry_exp = features.get('asymmetry', (0.5, ""))
-        border_score, border_exp = features.get('border', (0.5, ""))
-        color_score, color_exp, color_count = features.get('color', (0.5, "", 1))
-        diameter_mm = features.get('diameter_mm', 0)
-        
-        report.append("=== CLINICAL FEATURE ANALYSIS ===\n")
-        
-        if asymmetry_score > 0.6:
-            report.append(f"ASYMMETRY: {asymmetry_exp}")
-        else:
-            report.append(f"SYMMETRY: {asymmetry_exp}")
-        
-        if border_score > 0.6:
-            report.append(f"BORDER: {border_exp}")
-        else:
-            report.append(f"BORDER: {border_exp}")
-        
-        if color_score > 0.5:
-            report.append(f"COLOR: {color_exp}")
-        else:
-            report.append(f"COLOR: {color_exp}")
-        
-        if diameter_mm > 6:
-            report.append(f"DIAMETER: {diameter_mm:.1f}mm (>6mm threshold)")
-        elif diameter_mm > 0:
-            report.append(f"DIAMETER: {diameter_mm:.1f}mm (within normal range)")
-        else:
-            report.append("DIAMETER: Could not measure accurately")
-        
-        risk_factors = sum([
-            asymmetry_score > 0.5,
-            border_score > 0.5,
-            color_score > 0.4,
-            diameter_mm > 6
-        ])
-        
-        report.append("\n=== SUMMARY ===\n")
-        if risk_factors >= 3:
-            report.append("HIGH RISK: Multiple concerning features detected")
-        elif risk_factors >= 2:
-            report.append("MODERATE RISK: Some concerning features present")
-        elif risk_factors >= 1:
-            report.append("LOW RISK: Minor features detected, monitor for changes")
-        else:
-            report.append("VERY LOW RISK: No concerning features detected")
-        
-        return "\n".join(report)
+        With prepare_heatmap False (the model exports its own CAM) the contour
+        heatmap is not prepared and 'heatmap_prep' is None.
+        """
+        start = time.perf_counter()
+        timings = {}
+        ita_score, skin_tone, contrast_boost, bias_risk = self._timed(
+            timings, 'ita', ITAPreprocessor.calculate_ita, frame)
+        preprocessed_frame = self._timed(
+            timings, 'contrast', ITAPreprocessor.apply_adaptive_contrast, frame, contrast_boost)
+        
+        pipeline = FramePipeline(preprocessed_frame)
+        futures = {
+            'inference': self._executor.submit(self._timed, timings, 'inference', infer, pipeline),
+            'abcd': self._executor.submit(self._timed, timings, 'features', pipeline.analyze),
+        }
+        if prepare_heatmap:
+            futures['heatmap_prep'] = self._executor.submit(self._timed, timings, 'heatmap_prep', HeatmapEngine.prepare,
+                                                            preprocessed_frame, overlay_image=frame)
+        # Wait for every stage before raising, so no stage outlives the scan
+        for future in futures.values():
+            future.exception()
+        results = {name: future.result() for name, future in futures.items()}
+        results.setdefault('heatmap_prep', None)
+        
+        results.update(ita_score=ita_score, skin_tone=skin_tone, contrast_boost=contrast_boost,
+                       bias_risk=bias_risk, preprocessed_frame=preprocessed_frame, pipeline=pipeline,
+                       timings=timings, elapsed_ms=(time.perf_counter() - start) * 1000)
+        return results
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
 
 
 # ---------------- CAMERA THREAD - WORKING PERFECTLY ---------------- #
@@ -898,6 +3129,250 @@ class BodyLocationDialog(QDialog):
         return self.selected_location
 
 
+# ---------------- PAGED LIST MODELS ---------------- #
+LIST_PAGE_SIZE = 50
+
+def fetch_lesion_page(after_key, limit):
+    """Tracked lesions newest first, continuing after the (first_seen_epoch, lesion_id) key"""
+    if after_key is None:
+        return tracking_db.query('''
+            SELECT l.lesion_id, l.first_seen, l.body_location, l.feature_count, l.first_seen_epoch,
+                   s.scan_count, s.latest_risk, s.latest_prediction
+            FROM lesions l
+            LEFT JOIN lesion_summary s ON s.lesion_id = l.lesion_id
+            ORDER BY l.first_seen_epoch DESC, l.lesion_id DESC
+            LIMIT ?
+        ''', (limit,))
+    return tracking_db.query('''
+        SELECT l.lesion_id, l.first_seen, l.body_location, l.feature_count, l.first_seen_epoch,
+               s.scan_count, s.latest_risk, s.latest_prediction
+        FROM lesions l
+        LEFT JOIN lesion_summary s ON s.lesion_id = l.lesion_id
+        WHERE (l.first_seen_epoch, l.lesion_id) < (?, ?)
+        ORDER BY l.first_seen_epoch DESC, l.lesion_id DESC
+        LIMIT ?
+    ''', (after_key[0], after_key[1], limit))
+
+def lesion_page_key(row):
+    return (row[4], row[0])
+
+def fetch_high_risk_page(after_key, limit, days=30):
+    """HIGH/URGENT scans from the last `days` days, newest first, after the (ts_epoch, scan_id) key"""
+    since_epoch = int((datetime.now() - timedelta(days=days)).timestamp())
+    if after_key is None:
+        after_key = (2 ** 62, 0)
+    return tracking_db.query('''
+        SELECT scan_id, timestamp, prediction, confidence, risk_level, ts_epoch
+        FROM scans
+        WHERE risk_level IN ('HIGH', 'URGENT')
+        AND ts_epoch > ?
+        AND (ts_epoch, scan_id) < (?, ?)
+        ORDER BY ts_epoch DESC, scan_id DESC
+        LIMIT ?
+    ''', (since_epoch, after_key[0], after_key[1], limit))
+
+def high_risk_page_key(row):
+    return (row[5], row[0])
+
+def fetch_daily_high_risk_counts(days=30):
+    """Per-day HIGH/URGENT scan counts from the trigger-maintained summary table"""
+    return tracking_db.query('''
+        SELECT day, risk_level, scan_count
+        FROM daily_risk_counts
+        WHERE day >= date('now', 'localtime', ?)
+        AND risk_level IN ('HIGH', 'URGENT')
+        ORDER BY day DESC, risk_level DESC
+    ''', (f'-{int(days)} days',))
+
+def fetch_lesion_timeline(lesion_id, after_key=None, limit=LIST_PAGE_SIZE, include_archive=False):
+    """Scans of one lesion newest first, each with its delta from the scan before it.
+
+    LAG() runs over the page plus one older look-ahead scan, so a page reads
+    limit + 1 rows of idx_scans_lesion_time however long the history is. Rows are
+    (scan_id, timestamp, prediction, confidence, risk_level, match_count, ts_epoch,
+    prev_prediction, prev_risk, confidence_delta); the prev_* columns and the delta
+    are NULL for the lesion's first scan. include_archive reads all_scans so the
+    history continues into archived scans.
+    """
+    if after_key is None:
+        after_key = (2 ** 62, 0)
+    source = 'all_scans' if include_archive else 'scans'
+    return tracking_db.query(f'''
+        SELECT scan_id, timestamp, prediction, confidence, risk_level, match_count, ts_epoch,
+               prev_prediction, prev_risk, confidence_delta
+        FROM (
+            SELECT scan_id, timestamp, prediction, confidence, risk_level, match_count, ts_epoch,
+                   LAG(prediction) OVER w AS prev_prediction,
+                   LAG(risk_level) OVER w AS prev_risk,
+                   confidence - LAG(confidence) OVER w AS confidence_delta
+            FROM (
+                SELECT scan_id, lesion_id, timestamp, prediction, confidence, risk_level, match_count, ts_epoch
+                FROM {source}
+                WHERE lesion_id = ?
+                AND (ts_epoch, scan_id) < (?, ?)
+                ORDER BY ts_epoch DESC, scan_id DESC
+                LIMIT ?
+            )
+            WINDOW w AS (PARTITION BY lesion_id ORDER BY ts_epoch, scan_id)
+        )
+        ORDER BY ts_epoch DESC, scan_id DESC
+        LIMIT ?
+    ''', (lesion_id, after_key[0], after_key[1], limit + 1, limit))
+
+def timeline_page_key(row):
+    return (row[6], row[0])
+
+class PagedQueryModel(QAbstractListModel):
+    """List model that pulls rows from the tracking database one keyset page at a time.
+
+    fetch_page(after_key, limit) returns rows in display order, key_of(row) gives the
+    keyset cursor for a row, format_row(row) its display text and item_data(row) the
+    value exposed under Qt.UserRole. Views request further pages as they scroll.
+    """
+    
+    def __init__(self, fetch_page, key_of, format_row, item_data=None, empty_text="",
+                 page_size=LIST_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.key_of = key_of
+        self.format_row = format_row
+        self.item_data = item_data
+        self.empty_text = empty_text
+        self.page_size = page_size
+        self.rows = []
+        self._exhausted = False
+        self._placeholder = None
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if not self.rows and self._placeholder:
+            return 1
+        return len(self.rows)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if not self.rows:
+            return self._placeholder if role == Qt.DisplayRole else None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return self.format_row(row)
+        if role == Qt.UserRole and self.item_data is not None:
+            return self.item_data(row)
+        return None
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        after_key = self.key_of(self.rows[-1]) if self.rows else None
+        try:
+            page = self.fetch_page(after_key, self.page_size)
+        except Exception as e:
+            print(f"Error fetching list page: {e}")
+            if not self.rows:
+                self._set_placeholder(f"Error: {str(e)}")
+            self._exhausted = True
+            return
+        
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if not page:
+            if not self.rows:
+                self._set_placeholder(self.empty_text)
+            return
+        
+        if not self.rows and self._placeholder:
+            self._set_placeholder(None)
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+    
+    def _set_placeholder(self, text):
+        had_row = bool(self._placeholder)
+        if had_row:
+            self.beginRemoveRows(QModelIndex(), 0, 0)
+            self._placeholder = None
+            self.endRemoveRows()
+        if text:
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self._placeholder = text
+            self.endInsertRows()
+    
+    def reload(self):
+        """Drop every loaded row and fetch the first page again"""
+        self.beginResetModel()
+        self.rows = []
+        self._placeholder = None
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+    
+    def refresh(self):
+        """Merge the current first page into the loaded rows, emitting only the differences"""
+        if not self.rows:
+            self.reload()
+            return
+        try:
+            page = self.fetch_page(None, self.page_size)
+        except Exception as e:
+            print(f"Error refreshing list: {e}")
+            return
+        if not page:
+            self.reload()
+            return
+        
+        try:
+            loaded = {self.key_of(row): i for i, row in enumerate(self.rows)}
+            page_keys = set(self.key_of(row) for row in page)
+            first_key = self.key_of(self.rows[0])
+            new_rows = [row for row in page if self.key_of(row) > first_key]
+            # Any loaded row inside the range the fresh page covers but missing from it was removed
+            covered_to = self.key_of(page[-1]) if len(page) == self.page_size else None
+            removed = any(key not in page_keys and (covered_to is None or key >= covered_to) for key in loaded)
+        except TypeError:
+            removed = True
+        if removed:
+            self.reload()
+            return
+        
+        if new_rows:
+            self.beginInsertRows(QModelIndex(), 0, len(new_rows) - 1)
+            self.rows[0:0] = new_rows
+            self.endInsertRows()
+        
+        for row in page:
+            i = loaded.get(self.key_of(row))
+            if i is None:
+                continue
+            i += len(new_rows)
+            if self.rows[i] != row:
+                self.rows[i] = row
+                self.dataChanged.emit(self.index(i), self.index(i))
+
+def sync_list_widget(list_widget, texts, bold_prefix=None):
+    """Update a QListWidget in place so it shows texts, touching only items that differ"""
+    for i, text in enumerate(texts):
+        item = list_widget.item(i)
+        if item is None:
+            item = QListWidgetItem(text)
+            list_widget.addItem(item)
+        elif item.text() == text:
+            continue
+        else:
+            item.setText(text)
+        if bold_prefix is not None:
+            font = item.font()
+            font.setBold(text.startswith(bold_prefix))
+            item.setFont(font)
+    while list_widget.count() > len(texts):
+        list_widget.takeItem(list_widget.count() - 1)
+
+
 # ---------------- PAST SCANS VIEWER DIALOG (FIXED) ---------------- #
 class PastScansViewer(QDialog):
     def __init__(self, parent=None):
@@ -916,7 +3391,7 @@ class PastScansViewer(QDialog):
             QLabel { font-size: 14px; }
             QPushButton { font-size: 14px; font-weight: bold; padding: 10px; border-radius: 8px; }
             QTextEdit { background-color: #f8fff8; border: 2px solid #94ffed; border-radius: 10px; font-size: 13px; }
-            QListWidget { background-color: white; border: 2px solid #94ffed; border-radius: 10px; padding: 10px; }
+            QListView { background-color: white; border: 2px solid #94ffed; border-radius: 10px; padding: 10px; }
             QComboBox { font-size: 14px; padding: 8px; border: 2px solid #94ffed; border-radius: 8px; background-color: white; }
         """)
         
@@ -964,9 +3439,14 @@ class PastScansViewer(QDialog):
         
         # Lesion list
         layout.addWidget(QLabel("Select a tracked lesion:"))
-        self.lesion_list = QListWidget()
+        self.lesion_model = PagedQueryModel(
+            fetch_lesion_page, lesion_page_key, self.format_lesion_row,
+            item_data=lambda row: row[0], empty_text="No tracked lesions found", parent=self)
+        self.lesion_list = QListView()
+        self.lesion_list.setModel(self.lesion_model)
+        self.lesion_list.setUniformItemSizes(True)
         self.lesion_list.setMaximumHeight(150)
-        self.lesion_list.itemClicked.connect(self.on_lesion_selected)
+        self.lesion_list.clicked.connect(self.on_lesion_selected)
         layout.addWidget(self.lesion_list)
         
         # Scan selector
@@ -1028,33 +3508,19 @@ class PastScansViewer(QDialog):
         self.setLayout(layout)
     
     def load_lesion_list(self):
-        """Load all tracked lesions from database"""
-        self.lesion_list.clear()
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT lesion_id, body_location, first_seen, feature_count FROM lesions ORDER BY first_seen DESC')
-            lesions = cursor.fetchall()
-            conn.close()
-            
-            for lesion in lesions:
-                lesion_id, body_location, first_seen, feature_count = lesion
-                feature_text = f" [{feature_count} features]" if feature_count else ""
-                location_text = body_location if body_location else "Unknown location"
-                display_text = f"{location_text}{feature_text} - {first_seen[:10]}"
-                self.lesion_list.addItem(display_text)
-                self.lesion_list.item(self.lesion_list.count() - 1).setData(Qt.UserRole, lesion_id)
-            
-            if len(lesions) == 0:
-                self.lesion_list.addItem("No tracked lesions found")
-                
-        except Exception as e:
-            self.lesion_list.addItem(f"Error: {str(e)}")
-            print(f"Error loading lesion list: {e}")
+        """Load the first page of tracked lesions; further pages load as the list scrolls"""
+        self.lesion_model.reload()
     
-    def on_lesion_selected(self, item):
+    @staticmethod
+    def format_lesion_row(lesion):
+        lesion_id, first_seen, body_location, feature_count = lesion[:4]
+        feature_text = f" [{feature_count} features]" if feature_count else ""
+        location_text = body_location if body_location else "Unknown location"
+        return f"{location_text}{feature_text} - {first_seen[:10]}"
+    
+    def on_lesion_selected(self, index):
         """Load scans for selected lesion"""
-        lesion_id = item.data(Qt.UserRole)
+        lesion_id = index.data(Qt.UserRole)
         if not lesion_id:
             return
         
@@ -1063,16 +3529,12 @@ class PastScansViewer(QDialog):
         self.scans = []
         
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
+            self.scans = tracking_db.query('''
                 SELECT scan_id, timestamp, image_path, prediction, confidence, risk_level, match_count
-                FROM scans
+                FROM all_scans
                 WHERE lesion_id = ?
-                ORDER BY timestamp DESC
+                ORDER BY ts_epoch DESC, scan_id DESC
             ''', (lesion_id,))
-            self.scans = cursor.fetchall()
-            conn.close()
             
             for scan in self.scans:
                 scan_id, timestamp, image_path, prediction, confidence, risk_level, match_count = scan
@@ -1099,29 +3561,14 @@ class PastScansViewer(QDialog):
         scan = self.scans[index]
         scan_id, timestamp, image_path, prediction, confidence, risk_level, match_count = scan
         
-        # Display original image
+        # Display-sized renditions; only the first view of a photo decodes it
         if image_path and os.path.exists(image_path):
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                scaled_pixmap = pixmap.scaled(300, 250, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.past_original_label.setPixmap(scaled_pixmap)
-                
-                # Generate Grad-CAM for this image
-                try:
-                    img = cv2.imread(image_path)
-                    if img is not None:
-                        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                        heatmap, _ = GradCAMVisualizer.generate_heatmap(img_rgb, prediction, confidence)
-                        blended = GradCAMVisualizer.overlay_heatmap(img_rgb, heatmap, alpha=0.5)
-                        
-                        h, w, ch = blended.shape
-                        bytes_per_line = ch * w
-                        qt_img = QtGui.QImage(blended.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
-                        grad_pixmap = QPixmap.fromImage(qt_img).scaled(300, 250, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                        self.past_grad_label.setPixmap(grad_pixmap)
-                except Exception as e:
-                    self.past_grad_label.setText("Heatmap unavailable")
-            else:
+            try:
+                thumb_path, overlay_path = renditions.get(image_path, prediction, confidence)
+                for label, path in ((self.past_original_label, thumb_path), (self.past_grad_label, overlay_path)):
+                    label.setPixmap(QPixmap(path).scaled(300, 250, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            except Exception as e:
+                print(f"Rendition error for {image_path}: {e}")
                 self.past_original_label.setText("Image file corrupted")
                 self.past_grad_label.setText("Image file corrupted")
         else:
@@ -1881,20 +4328,33 @@ Use SPF 15+ daily"""
 
 
 # ---------------- OPERATION ORACLE DASHBOARD ---------------- #
+# How often the open dashboard checks for database changes (ms)
+DASHBOARD_REFRESH_INTERVAL_MS = 2000
+
 class OperationOracleDashboard(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent_app = parent
+        self._dirty_tables = set()
         self.initUI()
         self.refresh_data()
         
+        # Auto-refresh is change-driven: the writer reports the tables it touched and
+        # PRAGMA data_version catches commits from anywhere else; when neither moved,
+        # a tick costs one pragma read
+        self._data_version = tracking_db.data_version()
+        db_writer.tables_changed.connect(self.on_tables_changed)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.auto_refresh)
+        self.refresh_timer.start(DASHBOARD_REFRESH_INTERVAL_MS)
+        
     def initUI(self):
         self.setWindowTitle("Operation Oracle - Unified Patient Record")
         self.setMinimumSize(700, 500)
         self.setStyleSheet("""
             QDialog { background-color: #b8fcbf; }
             QLabel { font-size: 14px; }
-            QListWidget { background-color: white; border: 2px solid #94ffed; border-radius: 10px; padding: 10px; font-size: 13px; }
+            QListView { background-color: white; border: 2px solid #94ffed; border-radius: 10px; padding: 10px; font-size: 13px; }
             QGroupBox { font-size: 16px; font-weight: bold; border: 2px solid #94ffed; border-radius: 8px; margin-top: 12px; padding-top: 10px; }
             QGroupBox::title { subcontrol-origin: margin; left: 10px; padding: 0 5px 0 5px; }
             QPushButton { font-size: 14px; font-weight: bold; padding: 8px 16px; border-radius: 8px; }
@@ -1937,7 +4397,7 @@ class OperationOracleDashboard(QDialog):
         
         refresh_btn = QPushButton("REFRESH")
         refresh_btn.setStyleSheet("background-color: #94ffed; color: #00695c;")
-        refresh_btn.clicked.connect(self.refresh_data)
+        refresh_btn.clicked.connect(lambda: self.refresh_data())
         title_layout.addWidget(refresh_btn)
         
         main_layout.addWidget(title_bar)
@@ -1988,16 +4448,34 @@ class OperationOracleDashboard(QDialog):
         lesions_label.setStyleSheet("font-size: 16px; font-weight: bold; color: #00695c;")
         lesions_layout.addWidget(lesions_label)
         
-        self.lesions_list = QListWidget()
-        self.lesions_list.itemClicked.connect(self.on_lesion_selected)
+        self.lesions_model = PagedQueryModel(
+            fetch_lesion_page, lesion_page_key, self.format_lesion_row,
+            item_data=lambda row: row[0],
+            empty_text="No lesions being tracked yet - click 'Track Lesion' after a scan to start monitoring",
+            parent=self)
+        self.lesions_list = QListView()
+        self.lesions_list.setModel(self.lesions_model)
+        self.lesions_list.setUniformItemSizes(True)
+        self.lesions_list.clicked.connect(self.on_lesion_selected)
         lesions_layout.addWidget(self.lesions_list)
         
         self.lesion_detail = QTextEdit()
         self.lesion_detail.setReadOnly(True)
-        self.lesion_detail.setMaximumHeight(150)
+        self.lesion_detail.setMaximumHeight(80)
         self.lesion_detail.setStyleSheet("background-color: #f8fff8; border: 2px solid #94ffed; border-radius: 8px; padding: 8px;")
         lesions_layout.addWidget(self.lesion_detail)
         
+        self.selected_lesion_id = None
+        self.timeline_model = PagedQueryModel(
+            self.fetch_selected_timeline, timeline_page_key, self.format_timeline_row,
+            empty_text="Select a lesion to see its scan history", parent=self)
+        self.timeline_list = QListView()
+        self.timeline_list.setModel(self.timeline_model)
+        self.timeline_list.setUniformItemSizes(True)
+        self.timeline_list.setMaximumHeight(150)
+        self.timeline_list.setStyleSheet("background-color: #f8fff8; border: 2px solid #94ffed; border-radius: 8px;")
+        lesions_layout.addWidget(self.timeline_list)
+        
         self.tab_widget.addTab(lesions_tab, "Tracked Lesions")
         
         alerts_tab = QWidget()
@@ -2007,6 +4485,14 @@ class OperationOracleDashboard(QDialog):
         alerts_label.setStyleSheet("font-size: 16px; font-weight: bold; color: #d32f2f;")
         alerts_layout.addWidget(alerts_label)
         
+        self.high_risk_model = PagedQueryModel(
+            fetch_high_risk_page, high_risk_page_key, self.format_high_risk_row,
+            empty_text="No high-risk skin scans in the last 30 days", parent=self)
+        self.high_risk_list = QListView()
+        self.high_risk_list.setModel(self.high_risk_model)
+        self.high_risk_list.setUniformItemSizes(True)
+        alerts_layout.addWidget(self.high_risk_list)
+        
         self.alerts_list = QListWidget()
         alerts_layout.addWidget(self.alerts_list)
         
@@ -2034,209 +4520,209 @@ class OperationOracleDashboard(QDialog):
         viewer = PastScansViewer(self.parent_app)
         viewer.exec_()
     
-    def refresh_data(self):
-        self.load_skin_scans()
-        self.load_thoracic_scans()
-        self.load_tracked_lesions()
-        self.load_cross_modal_alerts()
+    def on_tables_changed(self, tables):
+        self._dirty_tables |= tables
+    
+    def auto_refresh(self):
+        try:
+            version = tracking_db.data_version()
+        except Exception as e:
+            print(f"Dashboard change check failed: {e}")
+            return
+        if version == self._data_version and not self._dirty_tables:
+            return
+        self._data_version = version
+        # A commit the writer didn't announce came from another connection: check every list
+        changed = self._dirty_tables or None
+        self._dirty_tables = set()
+        self.refresh_data(changed, incremental=True)
+    
+    def refresh_data(self, changed=None, incremental=False):
+        """Reload the lists that read any of the changed tables (all of them when changed is None)"""
+        def affected(*tables):
+            return changed is None or any(table in changed for table in tables)
+        
+        if affected('scans'):
+            self.load_skin_scans()
+        if affected('synced_records'):
+            self.load_thoracic_scans()
+        if affected('lesions', 'lesion_summary'):
+            self.load_tracked_lesions(incremental)
+            self.load_lesion_timeline(incremental)
+        if affected('scans', 'daily_risk_counts'):
+            self.load_cross_modal_alerts(incremental)
+    
+    def done(self, result):
+        self.refresh_timer.stop()
+        try:
+            db_writer.tables_changed.disconnect(self.on_tables_changed)
+        except TypeError:
+            pass
+        super().done(result)
     
     def load_skin_scans(self):
-        self.skin_list.clear()
+        texts = []
         
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            scans = tracking_db.query('''
                 SELECT timestamp, prediction, confidence, risk_level
                 FROM scans
-                ORDER BY timestamp DESC
+                ORDER BY ts_epoch DESC
                 LIMIT 20
             ''')
             
-            scans = cursor.fetchall()
-            conn.close()
-            
             for scan in scans:
                 timestamp, prediction, confidence, risk_level = scan
                 risk_indicator = "[URGENT]" if risk_level == "URGENT" else "[HIGH]" if risk_level == "HIGH" else "[LOW]"
-                item_text = f"{risk_indicator} {timestamp[:16]} - {prediction}"
-                self.skin_list.addItem(item_text)
+                texts.append(f"{risk_indicator} {timestamp[:16]} - {prediction}")
             
             if len(scans) == 0:
-                self.skin_list.addItem("No skin scans recorded yet")
+                texts.append("No skin scans recorded yet")
                 
         except Exception as e:
-            self.skin_list.addItem(f"Error loading skin scans: {str(e)}")
+            texts.append(f"Error loading skin scans: {str(e)}")
+        
+        sync_list_widget(self.skin_list, texts)
     
     def load_thoracic_scans(self):
         self.thoracic_list.clear()
         
-        fake_thoracic_scans = [
-            {
-                'timestamp': (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d %H:%M'),
-                'prediction': 'Obstruction Suspected - Tumor Presence',
-                'confidence': 0.87,
-                'risk_level': 'HIGH',
-                'findings': 'Right upper lobe shows irregular soft tissue density measuring approximately 2.8 cm. Features suggestive of primary pulmonary neoplasm. Mediastinal lymphadenopathy noted. Recommended: CT correlation and tissue biopsy.',
-                'sounds': 'Wheezing and diminished breath sounds on right side. Prolonged expiratory phase consistent with partial airway obstruction. Crackles noted in perihilar region.',
-                'impression': 'Suspicious for bronchogenic carcinoma with central airway compromise.'
-            },
-            {
-                'timestamp': (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d %H:%M'),
-                'prediction': 'COPD with Obstructive Pattern',
-                'confidence': 0.92,
-                'risk_level': 'HIGH',
-                'findings': 'Hyperinflated lungs with flattened diaphragms. Increased AP diameter. Bronchial wall thickening suggestive of chronic bronchitis. No discrete mass identified but central airway narrowing observed.',
-                'sounds': 'Polyphonic wheezing throughout lung fields. Prolonged expiration. Diminished breath sounds at bases. Scattered crackles that clear with cough.',
-                'impression': 'Severe COPD exacerbation with possible underlying malignancy. Recommend CT chest for further evaluation.'
-            }
-        ]
-        
-        for scan in fake_thoracic_scans:
-            risk_indicator = "[URGENT]" if scan['risk_level'] == 'HIGH' else "[MODERATE]" if scan['risk_level'] == 'MODERATE' else "[LOW]"
-            item_text = f"{risk_indicator} {scan['timestamp']} - {scan['prediction']}"
-            self.thoracic_list.addItem(item_text)
-            self.thoracic_list.item(self.thoracic_list.count() - 1).setData(Qt.UserRole, scan)
+        try:
+            scans = tracking_db.query('''
+                SELECT source_device, record_id, timestamp, prediction, risk_level
+                FROM synced_records
+                WHERE scan_type = 'thoracic'
+                ORDER BY ts_epoch DESC
+                LIMIT 20
+            ''')
+            
+            for source_device, record_id, timestamp, prediction, risk_level in scans:
+                risk_indicator = "[URGENT]" if risk_level == 'HIGH' else "[MODERATE]" if risk_level == 'MODERATE' else "[LOW]"
+                item_text = f"{risk_indicator} {(timestamp or '')[:16].replace('T', ' ')} - {prediction}"
+                self.thoracic_list.addItem(item_text)
+                self.thoracic_list.item(self.thoracic_list.count() - 1).setData(Qt.UserRole, (source_device, record_id))
+            
+            if len(scans) == 0:
+                self.thoracic_list.addItem("No thoracic scans synced yet")
+                
+        except Exception as e:
+            self.thoracic_list.addItem(f"Error loading thoracic scans: {str(e)}")
     
     def on_thoracic_scan_selected(self, item):
-        scan_data = item.data(Qt.UserRole)
+        record_key = item.data(Qt.UserRole)
+        if not record_key:
+            return
+        try:
+            row = tracking_db.query_one(
+                'SELECT payload FROM synced_records WHERE source_device = ? AND record_id = ?', record_key)
+            scan_data = json.loads(row[0]) if row else None
+        except Exception as e:
+            self.thoracic_detail.setText(f"Error loading details: {str(e)}")
+            return
         if scan_data:
             detail_html = f"""
             <h3 style='color:#00695c;'>Thoracic Assessment Details</h3>
-            <p><b>Findings:</b> {scan_data['findings']}</p>
-            <p><b>Breath Sounds:</b> {scan_data['sounds']}</p>
-            <p><b>Clinical Impression:</b> {scan_data['impression']}</p>
+            <p><b>Device:</b> {record_key[0]}</p>
+            <p><b>Findings:</b> {scan_data.get('findings', 'Not reported')}</p>
+            <p><b>Breath Sounds:</b> {scan_data.get('sounds', 'Not reported')}</p>
+            <p><b>Clinical Impression:</b> {scan_data.get('impression', 'Not reported')}</p>
             """
             self.thoracic_detail.setHtml(detail_html)
     
-    def load_tracked_lesions(self):
-        self.lesions_list.clear()
+    def load_tracked_lesions(self, incremental=False):
+        if incremental:
+            self.lesions_model.refresh()
+        else:
+            self.lesions_model.reload()
+    
+    @staticmethod
+    def format_lesion_row(lesion):
+        lesion_id, first_seen, body_location, feature_count, _, scan_count, latest_risk, _ = lesion
+        location_text = f" - {body_location}" if body_location else ""
+        feature_text = f" [{feature_count} ORB features]" if feature_count else ""
+        history_text = f" - {scan_count} scans, latest: {latest_risk}" if scan_count else ""
+        return f"Lesion: {lesion_id[:8]}...{location_text}{feature_text} (first seen: {first_seen[:10]}){history_text}"
+    
+    def fetch_selected_timeline(self, after_key, limit):
+        if self.selected_lesion_id is None:
+            return []
+        return fetch_lesion_timeline(self.selected_lesion_id, after_key, limit, include_archive=True)
+    
+    @staticmethod
+    def format_timeline_row(scan):
+        _, timestamp, prediction, confidence, risk_level, match_count, _, prev_prediction, prev_risk, confidence_delta = scan
+        risk_indicator = "[URGENT]" if risk_level == "URGENT" else "[HIGH]" if risk_level == "HIGH" else "[LOW]"
+        delta_text = f", {confidence_delta*100:+.0f}%" if confidence_delta is not None else ""
+        match_info = f" ({match_count} matches)" if match_count else ""
+        text = f"{risk_indicator} {timestamp[:16]} - {prediction} ({(confidence or 0):.0%}{delta_text}){match_info}"
+        changes = describe_scan_delta(prev_prediction, prediction, prev_risk, risk_level)
+        if changes:
+            text += " | " + "; ".join(changes)
+        return text
+    
+    def on_lesion_selected(self, index):
+        lesion_id = index.data(Qt.UserRole)
+        if not lesion_id:
+            return
+        self.selected_lesion_id = lesion_id
+        self.load_lesion_timeline()
+    
+    def load_lesion_timeline(self, incremental=False):
+        if self.selected_lesion_id is None:
+            return
+        lesion_id = self.selected_lesion_id
         
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT lesion_id, first_seen, body_location, feature_count
-                FROM lesions
-                ORDER BY first_seen DESC
-            ''')
-            
-            lesions = cursor.fetchall()
-            conn.close()
-            
-            for lesion in lesions:
-                lesion_id, first_seen, body_location, feature_count = lesion
-                location_text = f" - {body_location}" if body_location else ""
-                feature_text = f" [{feature_count} ORB features]" if feature_count else ""
-                item_text = f"Lesion: {lesion_id[:8]}...{location_text}{feature_text} (first seen: {first_seen[:10]})"
-                self.lesions_list.addItem(item_text)
+            summary = tracking_db.query_one('''
+                SELECT l.body_location, s.scan_count
+                FROM lesions l
+                LEFT JOIN lesion_summary s ON s.lesion_id = l.lesion_id
+                WHERE l.lesion_id = ?
+            ''', (lesion_id,))
             
-            if len(lesions) == 0:
-                self.lesions_list.addItem("No lesions being tracked yet")
-                self.lesions_list.addItem("Click 'Track Lesion' after a scan to start monitoring")
-                
-        except Exception as e:
-            self.lesions_list.addItem(f"Error loading lesions: {str(e)}")
-    
-    def on_lesion_selected(self, item):
-        try:
-            text = item.text()
-            if "..." in text:
-                lesion_id_part = text.split(" ")[1].split("...")[0]
+            if summary is None:
+                self.lesion_detail.setText("Lesion no longer tracked")
             else:
-                lesion_id_part = text[:12] if len(text) > 12 else text
-            
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT lesion_id FROM lesions WHERE lesion_id LIKE ?', (lesion_id_part + '%',))
-            result = cursor.fetchone()
-            
-            if result:
-                lesion_id = result[0]
-                
-                cursor.execute('''
-                    SELECT timestamp, prediction, confidence, risk_level, match_count
-                    FROM scans
-                    WHERE lesion_id = ?
-                    ORDER BY timestamp ASC
-                ''', (lesion_id,))
-                
-                scans = cursor.fetchall()
-                conn.close()
-                
-                detail_html = f"<h3 style='color:#00695c;'>Lesion: {lesion_id[:12]}...</h3>"
-                detail_html += f"<p><b>Total scans:</b> {len(scans)}</p>"
-                detail_html += f"<p><b>ORB Matching Threshold:</b> 35 matches required</p>"
-                
-                if len(scans) >= 2:
-                    detail_html += "<h4 style='color:#00695c;'>Change History:</h4>"
-                    
-                    for i in range(1, len(scans)):
-                        prev = {'timestamp': scans[i-1][0], 'prediction': scans[i-1][1], 
-                                'confidence': scans[i-1][2], 'risk_level': scans[i-1][3],
-                                'match_count': scans[i-1][4] if len(scans[i-1]) > 4 else 0}
-                        curr = {'timestamp': scans[i][0], 'prediction': scans[i][1],
-                                'confidence': scans[i][2], 'risk_level': scans[i][3],
-                                'match_count': scans[i][4] if len(scans[i]) > 4 else 0}
-                        
-                        if curr.get('match_count', 0) > 0:
-                            detail_html += f"<p><b>{curr['timestamp'][:16]}:</b> Match confidence: {curr['match_count']} features matched (threshold: 35)</p>"
-                        
-                        if curr['prediction'] != prev['prediction']:
-                            detail_html += f"<p><b>{curr['timestamp'][:16]}:</b> Diagnosis changed from {prev['prediction']} to {curr['prediction']}</p>"
-                        
-                        if curr['risk_level'] != prev['risk_level']:
-                            detail_html += f"<p><b>{curr['timestamp'][:16]}:</b> Risk level changed from {prev['risk_level']} to {curr['risk_level']}</p>"
-                
-                detail_html += "<h4 style='color:#00695c; margin-top:10px;'>Scan History:</h4>"
-                for scan in scans:
-                    risk_indicator = "[URGENT]" if scan[3] == "URGENT" else "[HIGH]" if scan[3] == "HIGH" else "[LOW]"
-                    match_info = f" ({scan[4]} matches)" if len(scan) > 4 and scan[4] else ""
-                    detail_html += f"<p>{risk_indicator} {scan[0][:16]} - {scan[1]}{match_info}</p>"
-                
+                body_location, scan_count = summary
+                location_text = f" - {body_location}" if body_location else ""
+                detail_html = f"<h3 style='color:#00695c;'>Lesion: {lesion_id[:12]}...{location_text}</h3>"
+                detail_html += f"<p><b>Total scans:</b> {scan_count or 0} &nbsp; <b>ORB Matching Threshold:</b> 35 matches required</p>"
                 self.lesion_detail.setHtml(detail_html)
-            else:
-                conn.close()
-                
         except Exception as e:
             self.lesion_detail.setText(f"Error loading details: {str(e)}")
-    
-    def load_cross_modal_alerts(self):
-        self.alerts_list.clear()
         
+        if incremental:
+            self.timeline_model.refresh()
+        else:
+            self.timeline_model.reload()
+    
+    @staticmethod
+    def format_high_risk_row(scan):
+        scan_id, timestamp, prediction, confidence, risk_level, _ = scan
+        return f"HIGH RISK SKIN LESION detected on {timestamp[:10]}: {prediction} - Urgent follow-up recommended"
+    
+    def load_cross_modal_alerts(self, incremental=False):
         alerts = []
         
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            thirty_days_ago = (datetime.now() - timedelta(days=30)).isoformat()
-            
-            cursor.execute('''
-                SELECT timestamp, prediction, confidence, risk_level
-                FROM scans
-                WHERE risk_level IN ('HIGH', 'URGENT')
-                AND timestamp > ?
-                ORDER BY timestamp DESC
-            ''', (thirty_days_ago,))
-            
-            high_risk_scans = cursor.fetchall()
-            conn.close()
-            
-            for scan in high_risk_scans:
-                timestamp, prediction, confidence, risk_level = scan
-                alerts.append(f"HIGH RISK SKIN LESION detected on {timestamp[:10]}: {prediction} - Urgent follow-up recommended")
+            # High-risk scans page into their own list; the counts come from daily_risk_counts
+            if incremental:
+                self.high_risk_model.refresh()
+            else:
+                self.high_risk_model.reload()
+            daily_counts = fetch_daily_high_risk_counts(days=30)
             
-            if len(high_risk_scans) > 0:
+            if daily_counts:
+                alerts.append("=== HIGH-RISK SKIN SCANS (LAST 30 DAYS) ===")
+                for day, risk_level, scan_count in daily_counts:
+                    alerts.append(f"{day}: {scan_count} {risk_level} scan{'s' if scan_count != 1 else ''}")
                 alerts.append("")
                 alerts.append("=== PARANEOPLASTIC SYNDROME ASSESSMENT ===")
                 alerts.append("CLINICAL CORRELATION: High-risk skin findings detected. Thoracic assessment for concurrent abnormalities recommended.")
                 alerts.append("Recommend integrated oncology consultation and complete cutaneous examination.")
             
-            alerts.append("")
+            if alerts:
+                alerts.append("")
             alerts.append("=== THORACIC FINDINGS SUMMARY ===")
             alerts.append("Thoracic assessment reveals possible central airway obstruction with tumor-like features.")
             alerts.append("COPD characteristics detected including wheezing and prolonged expiration.")
@@ -2253,17 +4739,8 @@ class OperationOracleDashboard(QDialog):
             alerts.append(f"Error generating alerts: {str(e)}")
         
         if len(alerts) == 0:
-            self.alerts_list.addItem("No active cross-modal alerts")
-        else:
-            for alert in alerts:
-                if alert.startswith("==="):
-                    item = QListWidgetItem(alert)
-                    font = item.font()
-                    font.setBold(True)
-                    item.setFont(font)
-                    self.alerts_list.addItem(item)
-                else:
-                    self.alerts_list.addItem(alert)
+            alerts.append("No active cross-modal alerts")
+        sync_list_widget(self.alerts_list, alerts, bold_prefix="===")
 
 
 # ---------------- MAIN APP ---------------- #
@@ -2278,6 +4755,8 @@ class NomaAIApp(QMainWindow):
         self.max_blinks = 20
         self.current_image_for_tracking = None
         self.current_results_for_tracking = None
+        self.current_overlay_for_tracking = None
+        self.analysis = AnalysisOrchestrator()
 
         self.classes = [
             "Acne", "Actinic Keratosis", "Benign Tumors", "Bullous",
@@ -2298,6 +4777,19 @@ class NomaAIApp(QMainWindow):
         self.normal_classes = ["Normal"]
         self.is_classifying = False
 
+        db_writer.start()
+        sync_outbox.start(QThread.LowPriority)
+        sync_ingester.start(QThread.LowPriority)
+        self.archive_timer = QTimer()
+        self.archive_timer.timeout.connect(self.schedule_scan_archival)
+        self.archive_timer.start(ARCHIVE_INTERVAL_MS)
+        QTimer.singleShot(60000, self.schedule_scan_archival)
+        self.backup_thread = None
+        self.backup_timer = QTimer()
+        self.backup_timer.timeout.connect(self.start_backup)
+        self.backup_timer.start(BACKUP_INTERVAL_MS)
+        if backup_is_due():
+            QTimer.singleShot(BACKUP_STARTUP_DELAY_MS, self.start_backup)
         self.initUI()
         self.load_model()
         self.start_camera()
@@ -2649,100 +5141,153 @@ class NomaAIApp(QMainWindow):
             
             lesion_id = hashlib.md5(f"{location}{datetime.now().isoformat()}".encode()).hexdigest()
             
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            image_filename = os.path.join(TRACKED_IMAGES_DIR, f"{lesion_id}_{timestamp}.jpg")
-            
-            img_pil = Image.fromarray(self.current_image_for_tracking)
-            img_pil.save(image_filename)
-            
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT lesion_id, feature_descriptors FROM lesions')
-            existing_lesions = cursor.fetchall()
-            
-            matched_lesion_id = None
-            best_match_count = 0
-            best_match_score = 0
-            
-            for existing_id, existing_features in existing_lesions:
-                if existing_features:
-                    score, match_count, is_match = compare_lesions(features_bytes, existing_features, match_threshold=35)
-                    if is_match and match_count > best_match_count:
-                        best_match_count = match_count
-                        best_match_score = score
-                        matched_lesion_id = existing_id
-            
-            if matched_lesion_id:
-                lesion_id = matched_lesion_id
-                message = f"Lesion matched to existing record!\nMatch count: {best_match_count} features matched (threshold: 35)\nScore: {best_match_score:.1%}\nAdding new scan to history."
-                
-                cursor.execute('''
-                    INSERT INTO scans (lesion_id, timestamp, image_path, prediction, confidence, abcde_scores, risk_level, match_count)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (lesion_id, datetime.now().isoformat(), image_filename,
-                      self.current_results_for_tracking.get('cnn_prediction', 'unknown'),
-                      self.current_results_for_tracking.get('cnn_confidence', 0),
-                      self.current_results_for_tracking.get('abcde_scores_json', '{}'),
-                      self.current_results_for_tracking.get('risk_level', 'LOW'),
-                      best_match_count))
-                
-                cursor.execute('''
-                    SELECT timestamp, prediction, confidence, risk_level
-                    FROM scans
-                    WHERE lesion_id = ?
-                    ORDER BY timestamp ASC
-                ''', (lesion_id,))
-                
-                scans = cursor.fetchall()
-                
-                if len(scans) >= 2:
-                    prev = {'prediction': scans[-2][1], 'risk_level': scans[-2][3]}
-                    curr = {'prediction': scans[-1][1], 'risk_level': scans[-1][3]}
-                    
-                    if curr['prediction'] != prev['prediction']:
-                        message += f"\n\nDiagnosis changed from {prev['prediction']} to {curr['prediction']}"
-                    if curr['risk_level'] != prev['risk_level']:
-                        message += f"\nRisk level changed from {prev['risk_level']} to {curr['risk_level']}"
-            else:
-                message = f"New lesion tracked successfully!\nLocation: {location}\nID: {lesion_id[:12]}...\nFeatures extracted: {n_keypoints} keypoints (500 max)"
-                
-                cursor.execute('''
-                    INSERT INTO lesions (lesion_id, first_seen, body_location, feature_descriptors, feature_count)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (lesion_id, datetime.now().isoformat(), location, features_bytes, n_keypoints))
-                
-                cursor.execute('''
-                    INSERT INTO scans (lesion_id, timestamp, image_path, prediction, confidence, abcde_scores, risk_level, match_count)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (lesion_id, datetime.now().isoformat(), image_filename,
-                      self.current_results_for_tracking.get('cnn_prediction', 'unknown'),
-                      self.current_results_for_tracking.get('cnn_confidence', 0),
-                      self.current_results_for_tracking.get('abcde_scores_json', '{}'),
-                      self.current_results_for_tracking.get('risk_level', 'LOW'),
-                      0))
+            image_hash, image_filename = image_blobs.put(self.current_image_for_tracking)
+            renditions.put(image_hash, self.current_image_for_tracking, self.current_overlay_for_tracking)
             
-            conn.commit()
-            conn.close()
+            scan_time, scan_epoch = epoch_now()
+            results = self.current_results_for_tracking
             
+            scan_values = dict(
+                timestamp=scan_time, ts_epoch=scan_epoch, image_path=image_filename,
+                prediction=results.get('cnn_prediction', 'unknown'),
+                confidence=results.get('cnn_confidence', 0),
+                abcde_scores=results.get('abcde_scores_json', '{}'),
+                risk_level=results.get('risk_level', 'LOW'))
             sync_data = {
                 'type': 'skin_scan',
-                'lesion_id': lesion_id,
-                'prediction': self.current_results_for_tracking.get('cnn_prediction', 'unknown'),
-                'confidence': self.current_results_for_tracking.get('cnn_confidence', 0),
-                'risk_level': self.current_results_for_tracking.get('risk_level', 'LOW'),
+                'prediction': scan_values['prediction'],
+                'confidence': scan_values['confidence'],
+                'risk_level': scan_values['risk_level'],
                 'location': location,
-                'image_path': image_filename,
-                'feature_count': n_keypoints,
-                'match_count': best_match_count
+                'image_sha256': image_hash,
+                'feature_count': n_keypoints
             }
-            sync_scan_to_shared_folder(sync_data)
             
-            QMessageBox.information(self, "Lesion Tracked", message)
+            # Match, merge and write in one writer job, so two quick track actions
+            # cannot both match against (or overwrite) the same stored fingerprint.
+            # Only lesions at the same body location are candidates, which keeps
+            # the descriptor matching inside the write transaction short.
+            def track_scan(cursor):
+                matched_lesion_id = None
+                best_match_count = 0
+                best_match_score = 0
+                existing_lesions = load_lesion_payloads('orb', cursor, location=location)
+                
+                for existing_id, existing_features in existing_lesions:
+                    if existing_features:
+                        score, match_count, is_match = compare_lesions(features_bytes, existing_features, match_threshold=35)
+                        if is_match and match_count > best_match_count:
+                            best_match_count = match_count
+                            best_match_score = score
+                            matched_lesion_id = existing_id
+                
+                if matched_lesion_id:
+                    # Fold this scan's descriptors into the lesion fingerprint so later
+                    # scans under different lighting or angle can match it too
+                    merged_features, merged_count = merge_lesion_descriptors(
+                        dict(existing_lesions)[matched_lesion_id], features_bytes)
+                    store_lesion_payload(cursor, matched_lesion_id, merged_features, kind='orb')
+                    cursor.execute('UPDATE lesions SET feature_count = ? WHERE lesion_id = ?',
+                                   (merged_count, matched_lesion_id))
+                else:
+                    cursor.execute('''
+                        INSERT INTO lesions (lesion_id, first_seen, first_seen_epoch, body_location, feature_count)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (lesion_id, scan_time, scan_epoch, location, n_keypoints))
+                    store_lesion_payload(cursor, lesion_id, features_bytes, kind='orb')
+                
+                tracked_id = matched_lesion_id or lesion_id
+                scan_id = insert_scan(cursor, lesion_id=tracked_id, match_count=best_match_count, **scan_values)
+                enqueue_sync_record(cursor, dict(sync_data, lesion_id=tracked_id, match_count=best_match_count))
+                return dict(scan_id=scan_id, lesion_id=tracked_id, matched=matched_lesion_id is not None,
+                            match_count=best_match_count, match_score=best_match_score)
+            
+            db_writer.submit(track_scan, callback=lambda tracked, error: self.on_lesion_tracked(
+                location, n_keypoints, tracked, error),
+                tables=SCAN_WRITE_TABLES + ('lesions', 'lesion_payloads', 'sync_outbox'))
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to track lesion: {str(e)}")
 
+    def on_lesion_tracked(self, location, n_keypoints, tracked, error):
+        """Report a track action once its match-and-save job has committed"""
+        self.on_scan_saved(tracked and tracked['scan_id'], error)
+        if error is not None:
+            QMessageBox.critical(self, "Error", f"Failed to track lesion: {error}")
+            return
+        
+        lesion_id = tracked['lesion_id']
+        if tracked['matched']:
+            message = f"Lesion matched to existing record!\nMatch count: {tracked['match_count']} features matched (threshold: 35)\nScore: {tracked['match_score']:.1%}\nAdding new scan to history."
+            # The new scan's timeline row carries its delta from the scan before it
+            latest = fetch_lesion_timeline(lesion_id, limit=1, include_archive=True)
+            if latest:
+                _, _, prediction, _, risk_level, _, _, prev_prediction, prev_risk, confidence_delta = latest[0]
+                if prev_prediction is not None:
+                    changes = describe_scan_delta(prev_prediction, prediction, prev_risk, risk_level,
+                                                  confidence_delta or 0)
+                    if changes:
+                        message += "\n\n" + "\n".join(changes)
+        else:
+            message = f"New lesion tracked successfully!\nLocation: {location}\nID: {lesion_id[:12]}...\nFeatures extracted: {n_keypoints} keypoints (500 max)"
+        
+        QMessageBox.information(self, "Lesion Tracked", message)
+
+    def on_scan_saved(self, scan_id, error):
+        """Called on the GUI thread once the background writer has committed a scan"""
+        if error is not None:
+            print(f"Database save error: {error}")
+            self.results_label.setText(self.results_label.text() + f"\n\nWARNING: scan could not be saved ({error})")
+        else:
+            print(f"Scan {scan_id} saved to tracking database")
+            sync_outbox.wake()
+
+    def schedule_scan_archival(self):
+        """Copy one batch of old scans into the archive database; the delete follows its commit"""
+        db_writer.submit(copy_old_scans_to_archive, callback=self.on_scans_copied)
+
+    def on_scans_copied(self, copied, error):
+        if error is not None:
+            print(f"Scan archival error: {error}")
+            return
+        if copied:
+            # Separate transaction, queued only now that the copy has committed
+            db_writer.submit(delete_archived_scans, callback=self.on_scans_archived, tables=('scans',))
+
+    def on_scans_archived(self, moved, error):
+        if error is not None:
+            print(f"Scan archival error: {error}")
+            return
+        if moved:
+            print(f"Archived {moved} scans older than {SCAN_RETENTION_DAYS} days")
+        if moved >= ARCHIVE_BATCH_SIZE:
+            self.schedule_scan_archival()
+
+    def start_backup(self):
+        """Start a background backup unless one is running; retried later while a scan is in progress"""
+        if self.backup_thread is not None and self.backup_thread.isRunning():
+            return
+        if self.is_classifying:
+            QTimer.singleShot(5 * 60 * 1000, self.start_backup)
+            return
+        self.backup_thread = BackupThread(is_busy=lambda: self.is_classifying)
+        self.backup_thread.backup_finished.connect(self.on_backup_finished)
+        self.backup_thread.start()
+
+    def on_backup_finished(self, report):
+        if 'error' in report:
+            print(f"Backup failed: {report['error']}")
+            return
+        checks = ", ".join(f"{name}: {report[name]['quick_check']}"
+                           for name in ('tracking_db', 'archive_db') if name in report)
+        print(f"Backup finished in {report['seconds']}s ({report['mb_per_second']} MB/s); "
+              f"{report['images']['copied']} images copied; {checks}")
+
+    def stop_backup(self):
+        if self.backup_thread is not None and self.backup_thread.isRunning():
+            self.backup_thread.requestInterruption()
+            self.backup_thread.wait(3000)
+
     def show_documentation(self):
         dialog = QtWidgets.QDialog(self)
         dialog.setWindowTitle("NOMA AI | Open-Source Documentation")
@@ -2907,6 +5452,40 @@ class NomaAIApp(QMainWindow):
             """
         return ""
 
+    def run_inference(self, pipeline):
+        """Model pass on the enhanced frame; returns (predictions, class_index, confidence, cam)"""
+        img_array = self.preprocess_image(pipeline.image)
+
+        self.interpreter.set_tensor(self.input_details[0]['index'], img_array)
+        self.interpreter.invoke()
+        predictions = dequantize_output(self.interpreter, self.output_roles['probabilities'])
+        class_index = np.argmax(predictions[0])
+        confidence = np.max(predictions[0])
+
+        # Clamp confidence to 0-1 range (fix for weird values)
+        confidence = max(0.0, min(1.0, confidence))
+
+        normal_index = self.classes.index("Normal") if "Normal" in self.classes else -1
+        if normal_index >= 0 and predictions[0][normal_index] > 0.3:
+            sorted_indices = np.argsort(predictions[0])[::-1]
+            if sorted_indices[0] == normal_index and len(sorted_indices) > 1:
+                second_confidence = predictions[0][sorted_indices[1]]
+                if second_confidence > 0.3:
+                    predictions[0][normal_index] *= 0.85
+                    predictions[0] = predictions[0] / np.sum(predictions[0])
+                    class_index = np.argmax(predictions[0])
+                    confidence = np.max(predictions[0])
+                    confidence = max(0.0, min(1.0, confidence))
+
+        # Class activation map from the same invoke(), when the model exports one
+        cam = None
+        if 'feature_map' in self.output_roles and 'cam_weights' in self.output_roles:
+            feature_map = dequantize_output(self.interpreter, self.output_roles['feature_map'])
+            cam_weights = dequantize_output(self.interpreter, self.output_roles['cam_weights'])
+            cam = HeatmapEngine.class_activation_map(feature_map[0], cam_weights[0, class_index])
+
+        return predictions, class_index, confidence, cam
+
     def classify_image(self):
         if self.is_classifying:
             return
@@ -2925,40 +5504,15 @@ class NomaAIApp(QMainWindow):
             if len(frame.shape) == 2:
                 frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
             
-            # Calculate ITA for the original frame (before any preprocessing for display)
-            ita_score, skin_tone, contrast_boost, bias_risk = ITAPreprocessor.calculate_ita(frame)
-            
-            # Apply ITA-based adaptive contrast enhancement for model input
-            preprocessed_frame = ITAPreprocessor.apply_adaptive_contrast(frame, contrast_boost)
-            
-            # Convert to PIL for feature extraction
-            image = Image.fromarray(preprocessed_frame)
-            
-            # Also keep original for display
-            original_image = Image.fromarray(frame)
-            
-            img_array = self.preprocess_image(image)
-
-            self.interpreter.set_tensor(self.input_details[0]['index'], img_array)
-            self.interpreter.invoke()
-            predictions = self.interpreter.get_tensor(self.output_details[0]['index'])
-            class_index = np.argmax(predictions[0])
-            confidence = np.max(predictions[0])
-
-            # Clamp confidence to 0-1 range (fix for weird values)
-            confidence = max(0.0, min(1.0, confidence))
-
-            normal_index = self.classes.index("Normal") if "Normal" in self.classes else -1
-            if normal_index >= 0 and predictions[0][normal_index] > 0.3:
-                sorted_indices = np.argsort(predictions[0])[::-1]
-                if sorted_indices[0] == normal_index and len(sorted_indices) > 1:
-                    second_confidence = predictions[0][sorted_indices[1]]
-                    if second_confidence > 0.3:
-                        predictions[0][normal_index] *= 0.85
-                        predictions[0] = predictions[0] / np.sum(predictions[0])
-                        class_index = np.argmax(predictions[0])
-                        confidence = np.max(predictions[0])
-                        confidence = max(0.0, min(1.0, confidence))
+            # ITA and contrast boost, then inference, ABCD features and heatmap prep in parallel
+            has_cam = 'feature_map' in self.output_roles and 'cam_weights' in self.output_roles
+            analysis = self.analysis.run(frame, self.run_inference, prepare_heatmap=not has_cam)
+            ita_score, skin_tone, bias_risk = analysis['ita_score'], analysis['skin_tone'], analysis['bias_risk']
+            contrast_boost = analysis['contrast_boost']
+            pipeline = analysis['pipeline']
+            predictions, class_index, confidence, cam = analysis['inference']
+            print("Analysis stages: " + ", ".join(f"{stage} {ms:.1f}" for stage, ms in analysis['timings'].items())
+                  + f" (wall {analysis['elapsed_ms']:.1f} ms)")
 
             top3_indices = np.argsort(predictions[0])[-3:][::-1]
             top3 = [(self.classes[i], predictions[0][i]) for i in top3_indices]
@@ -2969,11 +5523,13 @@ class NomaAIApp(QMainWindow):
 
             predicted_class = self.classes[class_index]
 
-            # Extract clinical features from the preprocessed image (consistent with model input)
-            asymmetry_score, asymmetry_exp = ClinicalFeatureExtractor.calculate_asymmetry_score(image)
-            border_score, border_exp = ClinicalFeatureExtractor.calculate_border_score(image)
-            color_score, color_exp, color_count = ClinicalFeatureExtractor.analyze_color_distribution(image)
-            diameter_mm = ClinicalFeatureExtractor.estimate_diameter(image)
+            # Clinical features from the preprocessed image (consistent with model input)
+            abcd = analysis['abcd']
+            asymmetry_score, asymmetry_exp = abcd['asymmetry']
+            border_score, border_exp = abcd['border']
+            color_score, color_exp, color_count = abcd['color']
+            diameter_mm = abcd['diameter_mm']
+            print(f"Feature pipeline: {pipeline.timing_report()}")
 
             features = {
                 'asymmetry': asymmetry_score,
@@ -2982,12 +5538,7 @@ class NomaAIApp(QMainWindow):
                 'diameter_mm': diameter_mm
             }
 
-            clinical_report = ClinicalFeatureExtractor.generate_clinical_report({
-                'asymmetry': (asymmetry_score, asymmetry_exp),
-                'border': (border_score, border_exp),
-                'color': (color_score, color_exp, color_count),
-                'diameter_mm': diameter_mm
-            })
+            clinical_report = ClinicalFeatureExtractor.generate_clinical_report(abcd)
 
             feature_importance = (
                 f"Asymmetry: {asymmetry_score:.2f} - {asymmetry_exp}\n"
@@ -3031,15 +5582,23 @@ class NomaAIApp(QMainWindow):
                 ).scaled(300, 250, Qt.KeepAspectRatio, Qt.SmoothTransformation)
                 self.original_image_label.setPixmap(original_pixmap)
                 
-                # Generate Grad-CAM heatmap using the preprocessed frame (what the model sees)
-                heatmap, bbox = GradCAMVisualizer.generate_heatmap(preprocessed_frame, predicted_class, confidence)
-                blended = GradCAMVisualizer.overlay_heatmap(frame, heatmap, alpha=0.5)
+                # Model CAM if exported, else the lesion-contour heatmap of the preprocessed frame
+                if cam is not None:
+                    blended, heatmap = pipeline.timed('heatmap', HeatmapEngine.render_cam, cam, frame)
+                    heatmap_source = f"The heatmap is the model's class activation map for {predicted_class}. "
+                else:
+                    prepared = analysis['heatmap_prep'] or HeatmapEngine.prepare(pipeline.image, overlay_image=frame)
+                    blended, heatmap = pipeline.timed('heatmap', HeatmapEngine.render_prepared,
+                                                      prepared, predicted_class, confidence)
+                    heatmap_source = "The heatmap is centered on the detected lesion contour (confidence-weighted). "
+                print(f"Heatmap: {pipeline.timings['heatmap']:.1f} ms")
                 
                 h, w, ch = blended.shape
                 bytes_per_line = ch * w
                 grad_qimage = QtGui.QImage(blended.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
                 grad_pixmap = QtGui.QPixmap.fromImage(grad_qimage).scaled(300, 250, Qt.KeepAspectRatio, Qt.SmoothTransformation)
                 self.analysis_label.setPixmap(grad_pixmap)
+                self.current_overlay_for_tracking = blended
                 
                 # Calculate max attention value for explanation
                 max_attention = np.max(heatmap) if np.max(heatmap) > 0 else 0.5
@@ -3048,7 +5607,7 @@ class NomaAIApp(QMainWindow):
                     f"GRAD-CAM EXPLANATION (Skin Tone: {skin_tone}, ITA: {ita_score:.1f} deg)\n\n"
                     f"Red and yellow areas (attention score: {max_attention:.2f}) show where the AI focused most for its prediction of {predicted_class}. "
                     f"These regions had the strongest influence on the model's decision. Blue and green areas had minimal influence. "
-                    f"The heatmap is centered on the detected lesion contour (confidence-weighted). "
+                    f"{heatmap_source}"
                     f"Bias Risk Level: {bias_risk} - {'Standard processing sufficient' if bias_risk == 'Low' else 'Adaptive contrast enhancement applied'}"
                 )
 
@@ -3062,21 +5621,6 @@ class NomaAIApp(QMainWindow):
 
                 disease_info = self.get_disease_info_html(results['cnn_prediction'])
 
-                try:
-                    conn = sqlite3.connect(DB_PATH)
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        INSERT INTO scans (lesion_id, timestamp, image_path, prediction, confidence, abcde_scores, risk_level, ita_score, skin_tone)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', ('single_scan', datetime.now().isoformat(), '', 
-                          results['cnn_prediction'], results['cnn_confidence'],
-                          results.get('abcde_scores_json', '{}'), results.get('risk_level', 'LOW'),
-                          ita_score, skin_tone))
-                    conn.commit()
-                    conn.close()
-                except Exception as e:
-                    print(f"Database save error: {e}")
-
                 sync_data = {
                     'type': 'skin_scan',
                     'prediction': results['cnn_prediction'],
@@ -3087,7 +5631,24 @@ class NomaAIApp(QMainWindow):
                     'ita_score': ita_score,
                     'skin_tone': skin_tone
                 }
-                sync_scan_to_shared_folder(sync_data)
+
+                try:
+                    scan_time, scan_epoch = epoch_now()
+                    scan_values = dict(
+                        lesion_id='single_scan', timestamp=scan_time, ts_epoch=scan_epoch, image_path='',
+                        prediction=results['cnn_prediction'], confidence=results['cnn_confidence'],
+                        abcde_scores=results.get('abcde_scores_json', '{}'), risk_level=results.get('risk_level', 'LOW'),
+                        ita_score=ita_score, skin_tone=skin_tone)
+
+                    def write_scan(cursor):
+                        scan_id = insert_scan(cursor, **scan_values)
+                        enqueue_sync_record(cursor, sync_data)
+                        return scan_id
+
+                    db_writer.submit(write_scan, callback=self.on_scan_saved,
+                                     tables=SCAN_WRITE_TABLES + ('sync_outbox',))
+                except Exception as e:
+                    print(f"Database save error: {e}")
 
                 result_text = f"""
 COMPREHENSIVE ANALYSIS COMPLETE
@@ -3171,14 +5732,19 @@ UNDERSTANDING YOUR RESULTS:
 
     def load_model(self):
         try:
-            model_path = '/home/havil/noma_ai/noma_model_quantized_int8.tflite'
+            # The CAM export adds class activation maps; older installs only have the int8 model
+            model_path = '/home/havil/noma_ai/noma_model_cam.tflite'
+            if not os.path.exists(model_path):
+                model_path = '/home/havil/noma_ai/noma_model_quantized_int8.tflite'
             self.interpreter = tflite.Interpreter(model_path=model_path)
             self.interpreter.allocate_tensors()
             self.input_details = self.interpreter.get_input_details()
             self.output_details = self.interpreter.get_output_details()
-            print("Model loaded successfully")
+            self.output_roles = tflite_output_roles(self.output_details)
+            print(f"Model loaded successfully: {os.path.basename(model_path)}")
             print(f"Input dtype: {self.input_details[0]['dtype']}")
             print(f"Input shape: {self.input_details[0]['shape']}")
+            print(f"Model CAM outputs: {'feature_map' in self.output_roles and 'cam_weights' in self.output_roles}")
             
             self.classify_button.setEnabled(True)
         except Exception as e:
@@ -3222,6 +5788,14 @@ UNDERSTANDING YOUR RESULTS:
         reply = QMessageBox.question(self, "Shutdown", "Shut down the device?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
             led_controller.cleanup()
+            self.stop_backup()
+            image_blobs.shutdown()
+            renditions.shutdown()
+            self.analysis.shutdown()
+            sync_outbox.stop()
+            sync_ingester.stop()
+            db_writer.stop()
+            tracking_db.close()
             os.system("sudo shutdown now")
 
     def closeEvent(self, event):
@@ -3232,13 +5806,39 @@ UNDERSTANDING YOUR RESULTS:
         if hasattr(self, 'tip_timer'):
             self.tip_timer.stop()
         led_controller.cleanup()
+        self.stop_backup()
+        image_blobs.shutdown()
+        renditions.shutdown()
+        self.analysis.shutdown()
+        sync_outbox.stop()
+        sync_ingester.stop()
+        db_writer.stop()
+        tracking_db.close()
         event.accept()
 
 if __name__ == '__main__':
+    if '--benchmark-db' in sys.argv:
+        benchmark_db_access()
+        sys.exit(0)
+    if '--backup' in sys.argv:
+        print(json.dumps(run_backup(), indent=2))
+        sys.exit(0)
+    if '--passport' in sys.argv:
+        # Stream assessments as JSON lines: --passport [--since ISO] [--until ISO] [--prediction NAME]
+        options = dict(zip(sys.argv[1:], sys.argv[2:]))
+        for record in health_passport.iter_assessments(options.get('--since'), options.get('--until'),
+                                                       options.get('--prediction')):
+            print(json.dumps(record, default=json_default))
+        sys.exit(0)
     app = QApplication(sys.argv)
     app.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     app.setOverrideCursor(Qt.BlankCursor)
     ex = NomaAIApp()
     ex.show()
     app.aboutToQuit.connect(led_controller.cleanup)
+    app.aboutToQuit.connect(image_blobs.shutdown)
+    app.aboutToQuit.connect(renditions.shutdown)
+    app.aboutToQuit.connect(sync_ingester.stop)
+    app.aboutToQuit.connect(sync_outbox.stop)
+    app.aboutToQuit.connect(db_writer.stop)
     sys.exit(app.exec_())
@@ -325,57 +325,103 @@ def user_profile_ui():
 
 # ==================== LOAD MODEL ====================
 
+# Model file, and the Grad-CAM layer resolved for it (kept next to the model)
+MODEL_PATH = 'noma_cancer_ai_model.keras'
+GRADCAM_LAYER_FILE = MODEL_PATH + '.gradcam.json'
+
+def model_file_signature(path=MODEL_PATH):
+    """Size and mtime of the model file; a changed model invalidates the saved layer"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def find_layer(model, layer_name):
+    """Layer by name at the top level or one nested model down, else None"""
+    for layer in model.layers:
+        if layer.name == layer_name:
+            return layer
+        if hasattr(layer, 'layers'):
+            for sublayer in layer.layers:
+                if sublayer.name == layer_name:
+                    return sublayer
+    return None
+
+def find_last_conv_layer(model):
+    """Heuristic search for the Grad-CAM layer of a MobileNetV3-style model"""
+    last_conv_layer_name = None
+    
+    # For MobileNetV3Small, look for the last conv layer in the backbone
+    for layer in reversed(model.layers):
+        # MobileNetV3Small's convolutional layers are within the functional API
+        if 'conv' in layer.name.lower() or 'expand' in layer.name.lower() or 'project' in layer.name.lower():
+            if hasattr(layer, 'layers'):  # It's a nested model
+                # Find the deepest conv layer within MobileNetV3Small
+                for sublayer in reversed(layer.layers):
+                    if 'conv' in sublayer.name.lower():
+                        last_conv_layer_name = sublayer.name
+                        break
+            elif 'conv' in layer.name.lower():
+                last_conv_layer_name = layer.name
+                break
+    
+    # Fallback: get the layer before the global average pooling
+    if last_conv_layer_name is None:
+        for i, layer in enumerate(model.layers):
+            if 'global_average_pooling2d' in layer.name.lower():
+                # Get the previous layer
+                last_conv_layer_name = model.layers[i-1].name
+                break
+    
+    # Another fallback for MobileNetV3
+    if last_conv_layer_name is None:
+        # MobileNetV3Small typically has its last conv layer named something like this
+        for layer in model.layers:
+            if hasattr(layer, 'layers'):
+                for sublayer in layer.layers:
+                    if hasattr(sublayer, 'layers'):
+                        for deep_layer in sublayer.layers:
+                            if 'conv' in deep_layer.name.lower() and 'final' in deep_layer.name.lower():
+                                last_conv_layer_name = deep_layer.name
+                                break
+    
+    if last_conv_layer_name is None:
+        # Final fallback - try to get any conv layer from the MobileNetV3Small
+        for layer in model.layers:
+            if 'mobilenetv3small' in layer.name.lower() and hasattr(layer, 'layers'):
+                for sublayer in layer.layers:
+                    if 'conv' in sublayer.name.lower():
+                        last_conv_layer_name = sublayer.name
+                        break
+    
+    return last_conv_layer_name
+
+def resolve_gradcam_layer(model):
+    """Grad-CAM layer name, read from GRADCAM_LAYER_FILE when it matches this model file"""
+    signature = model_file_signature()
+    try:
+        with open(GRADCAM_LAYER_FILE, 'r') as f:
+            saved = json.load(f)
+        if saved.get('model_signature') == signature and find_layer(model, saved.get('layer')) is not None:
+            return saved['layer']
+    except (OSError, ValueError):
+        pass
+    
+    last_conv_layer_name = find_last_conv_layer(model)
+    if last_conv_layer_name is not None:
+        try:
+            with open(GRADCAM_LAYER_FILE, 'w') as f:
+                json.dump({'layer': last_conv_layer_name, 'model_signature': signature}, f)
+        except OSError as e:
+            print(f"Could not save Grad-CAM layer: {e}")
+    return last_conv_layer_name
+
 @st.cache_resource
-def load_ai_model():
+def load_ai_model(model_signature):
+    """(model, Grad-CAM layer name); model_signature keys the cache, so a replaced model file is reloaded"""
     try:
-        # Use your specific model name
-        model = load_model('noma_cancer_ai_model.keras')
+        model = load_model(MODEL_PATH)
         
         # Get the last convolutional layer for Grad-CAM
-        last_conv_layer_name = None
-        
-        # For MobileNetV3Small, look for the last conv layer in the backbone
-        for layer in reversed(model.layers):
-            # MobileNetV3Small's convolutional layers are within the functional API
-            if 'conv' in layer.name.lower() or 'expand' in layer.name.lower() or 'project' in layer.name.lower():
-                if hasattr(layer, 'layers'):  # It's a nested model
-                    # Find the deepest conv layer within MobileNetV3Small
-                    for sublayer in reversed(layer.layers):
-                        if 'conv' in sublayer.name.lower():
-                            last_conv_layer_name = sublayer.name
-                            break
-                elif 'conv' in layer.name.lower():
-                    last_conv_layer_name = layer.name
-                    break
-        
-        # Fallback: get the layer before the global average pooling
-        if last_conv_layer_name is None:
-            for i, layer in enumerate(model.layers):
-                if 'global_average_pooling2d' in layer.name.lower():
-                    # Get the previous layer
-                    last_conv_layer_name = model.layers[i-1].name
-                    break
-        
-        # Another fallback for MobileNetV3
-        if last_conv_layer_name is None:
-            # MobileNetV3Small typically has its last conv layer named something like this
-            for layer in model.layers:
-                if hasattr(layer, 'layers'):
-                    for sublayer in layer.layers:
-                        if hasattr(sublayer, 'layers'):
-                            for deep_layer in sublayer.layers:
-                                if 'conv' in deep_layer.name.lower() and 'final' in deep_layer.name.lower():
-                                    last_conv_layer_name = deep_layer.name
-                                    break
-        
-        if last_conv_layer_name is None:
-            # Final fallback - try to get any conv layer from the MobileNetV3Small
-            for layer in model.layers:
-                if 'mobilenetv3small' in layer.name.lower() and hasattr(layer, 'layers'):
-                    for sublayer in layer.layers:
-                        if 'conv' in sublayer.name.lower():
-                            last_conv_layer_name = sublayer.name
-                            break
+        last_conv_layer_name = resolve_gradcam_layer(model)
             
         st.success(f"✅ Model loaded successfully! Using layer: {last_conv_layer_name}")
         return model, last_conv_layer_name
@@ -384,7 +430,11 @@ def load_ai_model():
         st.warning(f"Model not found or error loading: {e}. Running in demo mode with simulated predictions.")
         return None, None
 
-model, last_conv_layer = load_ai_model()
+try:
+    model_signature = tuple(model_file_signature())
+except OSError:
+    model_signature = None
+model, last_conv_layer = load_ai_model(model_signature)
 
 # Define classes (update this list to match your model's classes)
 classes = [
@@ -402,41 +452,73 @@ normal_classes = ["Normal"]
 
 # ==================== GRAD-CAM IMPLEMENTATION ====================
 
-def make_gradcam_heatmap(img_array, model, last_conv_layer_name, pred_index=None):
-    """Generate Grad-CAM heatmap"""
-    try:
-        # Get the last convolutional layer
-        last_conv_layer = model.get_layer(last_conv_layer_name)
-        
-        # Create a model that maps the input image to the activations of the last conv layer
-        grad_model = tf.keras.models.Model(
-            inputs=model.inputs,
-            outputs=[last_conv_layer.output, model.output]
-        )
+def build_grad_model(model, last_conv_layer_name):
+    """Model(image) -> [activations of last_conv_layer_name, predictions].
 
-        # Compute the gradient of the top predicted class for the conv layer output
-        with tf.GradientTape() as tape:
-            # Convert numpy array to tensor and ensure proper shape
-            img_tensor = tf.convert_to_tensor(img_array, dtype=tf.float32)
-            conv_outputs, predictions = grad_model(img_tensor)
-            if pred_index is None:
-                pred_index = tf.argmax(predictions[0])
-            class_channel = predictions[:, pred_index]
+    The layers are re-run in order, so a layer inside the nested backbone is
+    reachable without rebuilding the backbone graph.
+    """
+    inputs = tf.keras.Input(shape=model.input_shape[1:])
+    x, conv_outputs = inputs, None
+    for layer in model.layers[1:]:
+        if layer.name == last_conv_layer_name:
+            x = conv_outputs = layer(x, training=False)
+        elif hasattr(layer, 'layers') and any(sub.name == last_conv_layer_name for sub in layer.layers):
+            tap = tf.keras.Model(layer.inputs, [layer.get_layer(last_conv_layer_name).output, layer.output])
+            conv_outputs, x = tap(x, training=False)
+        else:
+            x = layer(x, training=False)
+    if conv_outputs is None:
+        raise ValueError(f"Layer {last_conv_layer_name} not found in model")
+    return tf.keras.Model(inputs, [conv_outputs, x])
 
-        # Gradient of the class output with respect to the feature map
-        grads = tape.gradient(class_channel, conv_outputs)
+# Number of ranked classes that get a Grad-CAM overlay in the analysis view
+GRADCAM_TOP_K = 3
 
-        # Global average pooling of gradients
-        pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
+def weighted_heatmaps(conv_map, grads):
+    """Grad-CAM maps (k, H, W) from one (H, W, C) activation map and k gradients of it.
 
-        # Weight the channels by corresponding gradients
-        conv_outputs = conv_outputs[0]
-        heatmap = tf.matmul(conv_outputs, pooled_grads[..., tf.newaxis])
-        heatmap = tf.squeeze(heatmap)
+    Each map is relu(sum_c mean_hw(grad[c]) * activation[c]), scaled to a peak of 1.
+    """
+    pooled_grads = tf.reduce_mean(grads, axis=(1, 2))                # (k, C)
+    heatmaps = tf.einsum('hwc,kc->khw', conv_map, pooled_grads)
+    heatmaps = tf.maximum(heatmaps, 0)
+    return tf.math.divide_no_nan(heatmaps, tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True))
+
+@st.cache_resource
+def load_topk_gradcam_function(_model, model_signature, last_conv_layer_name):
+    """Traced Grad-CAM for the k highest-scoring classes of one image.
+
+    Returns fn(img_tensor, k) -> (heatmaps (k, H, W), class_indices, predictions).
+    One forward pass; the k backward passes are vectorised by tape.jacobian
+    over the selected class channels. st.cache_resource does not hash _model, so
+    the cache is keyed on the model file signature and the layer name instead.
+    """
+    grad_model = build_grad_model(_model, last_conv_layer_name)
+    
+    @tf.function(input_signature=[
+        tf.TensorSpec(shape=(1,) + tuple(_model.input_shape[1:]), dtype=tf.float32),
+        tf.TensorSpec(shape=(), dtype=tf.int32),
+    ])
+    def gradcam_topk(img_tensor, k):
+        with tf.GradientTape() as tape:
+            conv_outputs, predictions = grad_model(img_tensor, training=False)
+            class_indices = tf.math.top_k(predictions[0], k=k).indices
+            class_channels = tf.gather(predictions[0], class_indices)
+        
+        # (k, 1, H, W, C): gradient of each selected class output with respect to the feature map
+        grads = tape.jacobian(class_channels, conv_outputs)
+        return weighted_heatmaps(conv_outputs[0], grads[:, 0]), class_indices, predictions[0]
+    
+    return gradcam_topk
 
-        # Normalize the heatmap
-        heatmap = tf.maximum(heatmap, 0) / tf.math.reduce_max(heatmap)
-        return heatmap.numpy()
+def make_topk_gradcam_heatmaps(img_array, model, last_conv_layer_name, k=GRADCAM_TOP_K):
+    """Grad-CAM heatmaps for the top-k classes; returns (heatmaps, class_indices, predictions) or None"""
+    try:
+        gradcam_topk = load_topk_gradcam_function(model, model_signature, last_conv_layer_name)
+        img_tensor = tf.convert_to_tensor(img_array, dtype=tf.float32)
+        heatmaps, class_indices, predictions = gradcam_topk(img_tensor, tf.constant(k, dtype=tf.int32))
+        return heatmaps.numpy(), class_indices.numpy(), predictions.numpy()
     except Exception as e:
         st.error(f"Grad-CAM error: {e}")
         return None
@@ -747,6 +829,7 @@ def analyze_image(image, clinical_risk):
         pred_class = np.random.choice(classes)
         confidence = np.random.uniform(0.6, 0.95)
         heatmap_img = None
+        alternative_heatmaps = []
     else:
         try:
             # Preprocess image for the model
@@ -754,32 +837,43 @@ def analyze_image(image, clinical_risk):
             img_array = np.array(img) / 255.0
             img_array = np.expand_dims(img_array, axis=0).astype(np.float32)
             
-            # Create a properly named input tensor
-            # Use dictionary input for the model with the correct layer name
-            inputs = {model.input_names[0]: img_array}
+            # Prediction and Grad-CAM for the top classes come from the same forward pass
+            topk = make_topk_gradcam_heatmaps(img_array, model, last_conv_layer) if last_conv_layer else None
+            if topk is not None:
+                heatmaps, top_indices, predictions = topk
+            else:
+                # Create a properly named input tensor
+                # Use dictionary input for the model with the correct layer name
+                inputs = {model.input_names[0]: img_array}
+                
+                # Make prediction using the dictionary input
+                predictions = model.predict(inputs, verbose=0)[0]
+                heatmaps, top_indices = [], []
             
-            # Make prediction using the dictionary input
-            predictions = model.predict(inputs, verbose=0)
-            class_idx = np.argmax(predictions[0])
-            confidence = float(predictions[0][class_idx])
+            class_idx = np.argmax(predictions)
+            confidence = float(predictions[class_idx])
             pred_class = classes[class_idx] if class_idx < len(classes) else f"Class_{class_idx}"
             
-            # Generate Grad-CAM heatmap
-            if last_conv_layer:
-                # Create a properly formatted input for Grad-CAM
-                heatmap = make_gradcam_heatmap(img_array, model, last_conv_layer, class_idx)
-                if heatmap is not None:
-                    heatmap_img = overlay_heatmap(heatmap, img)
+            # Overlay for the top class, plus the runners-up for comparison
+            heatmap_img = None
+            alternative_heatmaps = []
+            for rank, (heatmap, idx) in enumerate(zip(heatmaps, top_indices)):
+                overlay = overlay_heatmap(heatmap, img)
+                if rank == 0:
+                    heatmap_img = overlay
                 else:
-                    heatmap_img = None
-            else:
-                heatmap_img = None
+                    alternative_heatmaps.append({
+                        'class': classes[idx] if idx < len(classes) else f"Class_{idx}",
+                        'confidence': float(predictions[idx]),
+                        'heatmap': overlay
+                    })
                 
         except Exception as e:
             st.error(f"Model inference error: {e}")
             pred_class = "Error in analysis"
             confidence = 0.0
             heatmap_img = None
+            alternative_heatmaps = []
     
     # Determine class type
     if pred_class in malignant_classes:
@@ -805,7 +899,8 @@ def analyze_image(image, clinical_risk):
         'base_risk': base_risk,
         'combined_risk': combined_risk,
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'heatmap': heatmap_img
+        'heatmap': heatmap_img,
+        'alternative_heatmaps': alternative_heatmaps
     }
 
 # ==================== TRACKING DASHBOARD ====================
@@ -1027,6 +1122,7 @@ def main():
                                 # Remove heatmap from saved data (can't serialize image)
                                 if 'heatmap' in assessment:
                                     del assessment['heatmap']
+                                assessment.pop('alternative_heatmaps', None)
                                 patient['assessments'].append(assessment)
                             
                             st.success("Analysis complete!")
@@ -1086,6 +1182,16 @@ def main():
                             st.image(image, caption="Original Image", use_container_width=True)
                         with heat_col2:
                             st.image(results['heatmap'], caption="Grad-CAM Heatmap", use_container_width=True)
+                        
+                        # Where the model looked for the next most likely diagnoses
+                        alternatives = results.get('alternative_heatmaps') or []
+                        if alternatives:
+                            st.markdown("##### Alternative Diagnoses")
+                            for alt_col, alternative in zip(st.columns(len(alternatives)), alternatives):
+                                with alt_col:
+                                    st.image(alternative['heatmap'],
+                                             caption=f"{alternative['class']} ({alternative['confidence']:.1%})",
+                                             use_container_width=True)
                     
                     # Action buttons
                     col_a, col_b = st.columns(2)